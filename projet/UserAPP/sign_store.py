@@ -0,0 +1,143 @@
+"""Packed, memory-mapped storage for the sign image dataset.
+
+The store is two files living side by side:
+
+- ``<name>.bin``: every image as raw uint8 bytes, back to back.
+- ``<name>.idx.json``: ``{"version": 1, "words": {word: [[offset, *shape], ...]},
+  "hashes": {word: [sha1, ...]}}``.
+
+The hashes are the frames' content digests (see frame_digest) so readers can
+serve content-addressed URLs without hashing the whole blob themselves.
+
+Opening the store only parses the small index and maps the blob, so every
+worker process shares the same pages through the OS page cache instead of
+holding its own unpickled copy of every array.
+"""
+from pathlib import Path
+import hashlib
+import json
+import mmap
+import sys
+
+import numpy as np
+
+STORE_VERSION = 1
+
+
+def frame_digest(img_array) -> str:
+	"""sha1 hex digest of a frame's shape and pixels."""
+	digest = hashlib.sha1()
+	digest.update(str(img_array.shape).encode())
+	digest.update(np.ascontiguousarray(img_array).tobytes())
+	return digest.hexdigest()
+
+
+def _index_path(blob_path: Path) -> Path:
+	return blob_path.with_suffix(".idx.json")
+
+
+def store_exists(blob_path: Path) -> bool:
+	blob_path = Path(blob_path)
+	return blob_path.exists() and _index_path(blob_path).exists()
+
+
+def open_store(blob_path: Path):
+	"""Return ({word: [ndarray, ...]}, {(word, index): sha1}) or None.
+
+	Arrays are backed by a read-only mmap. The digest map is empty for stores
+	written before hashes were recorded.
+	"""
+	blob_path = Path(blob_path)
+	if not store_exists(blob_path):
+		return None
+	try:
+		with open(_index_path(blob_path), "r", encoding="utf-8") as f:
+			index = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if index.get("version") != STORE_VERSION:
+		return None
+
+	words = index.get("words", {})
+	if not words:
+		return None
+
+	with open(blob_path, "rb") as f:
+		# The mapping stays valid after the file object is closed.
+		blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+	stored_hashes = index.get("hashes", {})
+	mapping = {}
+	hashes = {}
+	for word, entries in words.items():
+		images = []
+		for entry in entries:
+			offset, shape = entry[0], tuple(entry[1:])
+			images.append(np.ndarray(shape, dtype=np.uint8, buffer=blob, offset=offset))
+		if images:
+			mapping[word] = images
+			digests = stored_hashes.get(word) or []
+			if len(digests) == len(images):
+				for i, digest in enumerate(digests):
+					hashes[(word, i)] = digest
+	if not mapping:
+		return None
+	return mapping, hashes
+
+
+def write_store(mapping, blob_path: Path):
+	"""Pack a {word: [ndarray, ...]} mapping into blob_path and its index."""
+	blob_path = Path(blob_path)
+	blob_path.parent.mkdir(parents=True, exist_ok=True)
+	words = {}
+	hashes = {}
+	offset = 0
+	tmp_blob = blob_path.with_suffix(blob_path.suffix + ".tmp")
+	with open(tmp_blob, "wb") as out:
+		for word, images in mapping.items():
+			entries = []
+			digests = []
+			for img in images:
+				if not isinstance(img, np.ndarray):
+					continue
+				arr = np.ascontiguousarray(img, dtype=np.uint8)
+				out.write(arr.tobytes())
+				entries.append([offset, *arr.shape])
+				digests.append(frame_digest(arr))
+				offset += arr.nbytes
+			if entries:
+				words[word] = entries
+				hashes[word] = digests
+
+	tmp_index = _index_path(blob_path).with_suffix(".tmp")
+	with open(tmp_index, "w", encoding="utf-8") as f:
+		json.dump({"version": STORE_VERSION, "words": words, "hashes": hashes}, f, ensure_ascii=False)
+
+	tmp_blob.replace(blob_path)
+	tmp_index.replace(_index_path(blob_path))
+	return len(words), offset
+
+
+def convert_pth(pth_path: Path, blob_path: Path):
+	"""Convert the legacy pickled sign_model_and_images.pth into a packed store."""
+	import torch
+
+	data = torch.load(pth_path, map_location="cpu", weights_only=False)
+	if not isinstance(data, dict):
+		raise ValueError(f"Unexpected content in {pth_path}")
+	raw_mapping = data.get("word_to_images", data)
+
+	mapping = {}
+	for word, images in raw_mapping.items():
+		if isinstance(word, str) and isinstance(images, (list, tuple)) and images:
+			mapping[word.lower()] = list(images)
+	return write_store(mapping, blob_path)
+
+
+if __name__ == "__main__":
+	# Usage: python -m UserAPP.sign_store [input.pth] [output.bin]
+	project_root = Path(__file__).resolve().parents[1]
+	src = Path(sys.argv[1]) if len(sys.argv) > 1 else project_root / "sign_model_and_images.pth"
+	dst = Path(sys.argv[2]) if len(sys.argv) > 2 else project_root / "sign_images.bin"
+	word_count, size = convert_pth(src, dst)
+	print(f"Packed {word_count} words ({size} bytes) into {dst}")
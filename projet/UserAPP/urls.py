@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.home, name='home'),              # /
     path('transcribe/', views.transcribe, name='transcribe'),
     path('avatar/', views.show_avatar, name='avatar'),
+    path('signs/<str:digest>.jpg', views.sign_image, name='sign_image'),
+    path('signs/<str:size>/<str:digest>.<str:ext>', views.sign_image, name='sign_image_variant'),
     path('learning/', views.learning, name='learning'),
     path('signin/', views.signin, name='signin'),
     path('signup/', views.signup, name='signup'),
@@ -1,27 +1,46 @@
 from pathlib import Path
-from random import choice
-import base64
+from random import randrange
+from collections import OrderedDict
 from io import BytesIO
+import os
 import re
-from difflib import get_close_matches
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from django.urls import reverse
 
-import torch
 import numpy as np
 
+from .sign_store import frame_digest, open_store
+
 try:
-    from PIL import Image
+    from PIL import Image, features
     PIL_AVAILABLE = True
+    WEBP_AVAILABLE = features.check("webp")
 except ImportError:
     PIL_AVAILABLE = False
+    WEBP_AVAILABLE = False
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 MODEL_PATH = PROJECT_ROOT / "sign_model_and_images.pth"
+# Packed mmap store produced by `python -m UserAPP.sign_store` (see sign_store.py).
+STORE_PATH = PROJECT_ROOT / "sign_images.bin"
+
+# Image variants served to clients: longest edge in pixels (None keeps the
+# stored resolution) and file extension -> (PIL format, content type).
+SIGN_SIZES = {"thumb": 96, "medium": 256, "full": None}
+SIGN_FORMATS = {"jpg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+DEFAULT_SIGN_SIZE = "full"
+DEFAULT_SIGN_FORMAT = "jpg"
 
 
 def _load_mapping_from_file(path: Path):
 	if not path.exists():
 		return None
 	try:
+		import torch
 		data = torch.load(path, map_location="cpu", weights_only=False)
 	except Exception:
 		return None
@@ -61,46 +80,72 @@ def _scan_dataset(dataset_dir: Path):
 
 
 def _load_word_to_images():
+	"""Return (mapping, known frame hashes); only the packed store records hashes."""
+	store = open_store(STORE_PATH)
+	if store:
+		return store
 	mapping = _load_mapping_from_file(MODEL_PATH)
 	if mapping:
-		return mapping
-	return {}
+		return mapping, {}
+	return {}, {}
 
 
 
-word_to_images = _load_word_to_images()
+word_to_images, _frame_hashes = _load_word_to_images()
 _normalized_index = None
+_normalized_fuzzy = None
+_raw_fuzzy = None
 FUZZY_CUTOFF = 0.70
+RESOLVE_CACHE_SIZE = 8192
+# Threads used to hash uncached frames in get_signs_for_texts (hashlib releases the GIL).
+SIGN_ENCODE_WORKERS = int(os.environ.get("SIGN_ENCODE_WORKERS", str(min(8, os.cpu_count() or 1))))
 ALIASES = {
 	"mra": "mar2a",
 }
 
-
-def _array_to_base64(img_array):
-	"""Convert numpy array to base64 data URL for HTML display."""
+# Encoded image bytes keyed by (word, image index, size, ext). The source
+# frames never change at runtime, so each variant only needs encoding once.
+SIGN_CACHE_SIZE = int(os.environ.get("SIGN_CACHE_SIZE", "4096"))
+SIGN_CACHE_EAGER = os.environ.get("SIGN_CACHE_EAGER", "0") == "1"
+# Variants warmed by SIGN_CACHE_EAGER, as "size.ext" pairs, e.g. "thumb.webp,full.jpg".
+SIGN_CACHE_WARM = [
+	tuple(item.strip().split(".", 1))
+	for item in os.environ.get("SIGN_CACHE_WARM", f"{DEFAULT_SIGN_SIZE}.{DEFAULT_SIGN_FORMAT}").split(",")
+	if "." in item
+]
+_encoded_cache = OrderedDict()
+_encoded_cache_lock = threading.Lock()
+_encoded_cache_stats = {"hits": 0, "misses": 0}
+
+# Content hashes of frames: (word, image index) -> sha1 hex (preloaded from
+# the store index, computed lazily otherwise), and the reverse index used by
+# the sign image endpoint, built once on first use.
+_hash_index = None
+_hash_lock = threading.Lock()
+_hash_index_lock = threading.Lock()
+
+
+def _encode_frame(img_array, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	"""Encode a numpy frame as image bytes for the given size/format variant."""
 	if not PIL_AVAILABLE:
 		print("ERROR: PIL/Pillow is not installed!")
 		return None
-		
+
 	try:
 		if isinstance(img_array, np.ndarray):
 			# Ensure uint8 type
 			if img_array.dtype != np.uint8:
 				img_array = img_array.astype(np.uint8)
-			
-			# Convert to PIL Image
+
 			img = Image.fromarray(img_array)
-			
-			# Convert to base64
+			max_edge = SIGN_SIZES[size]
+			if max_edge and max(img.size) > max_edge:
+				img.thumbnail((max_edge, max_edge), Image.LANCZOS)
 			buffered = BytesIO()
-			img.save(buffered, format="JPEG")
-			img_str = base64.b64encode(buffered.getvalue()).decode()
-			return f"data:image/jpeg;base64,{img_str}"
-		elif isinstance(img_array, str):
-			# Already a path or URL
-			return img_array
+			img.save(buffered, format=SIGN_FORMATS[ext][0])
+			return buffered.getvalue()
 	except Exception as e:
-		print(f"ERROR in _array_to_base64: {e}")
+		print(f"ERROR in _encode_frame: {e}")
 		import traceback
 		traceback.print_exc()
 		return None
@@ -130,61 +175,263 @@ def _build_normalized_index():
 	return index
 
 
+class _NgramIndex:
+	"""Bigram inverted index used to shortlist candidates for fuzzy matching.
+
+	best_match() scores the shortlist with the same SequenceMatcher ratio and
+	cutoff as difflib.get_close_matches(n=1), so results match the old linear
+	scan while only touching words that share at least one bigram.
+	"""
+
+	def __init__(self, words, n=2):
+		self.n = n
+		self.words = list(words)
+		self.postings = {}
+		for i, word in enumerate(self.words):
+			for gram in set(self._grams(word)):
+				self.postings.setdefault(gram, []).append(i)
+
+	def _grams(self, word: str):
+		padded = f"^{word}$"
+		return [padded[i:i + self.n] for i in range(len(padded) - self.n + 1)]
+
+	def best_match(self, word: str, cutoff: float):
+		if not word:
+			return None
+		candidates = set()
+		for gram in set(self._grams(word)):
+			candidates.update(self.postings.get(gram, ()))
+
+		matcher = SequenceMatcher()
+		matcher.set_seq2(word)
+		best = None
+		for i in candidates:
+			candidate = self.words[i]
+			# ratio() can never exceed 2 * min(len) / total length.
+			if 2.0 * min(len(word), len(candidate)) / (len(word) + len(candidate)) < cutoff:
+				continue
+			matcher.set_seq1(candidate)
+			if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+				score = matcher.ratio()
+				if score >= cutoff and (best is None or (score, candidate) > best):
+					best = (score, candidate)
+		return best[1] if best else None
+
+
+def _ensure_indexes():
+	global _normalized_index, _normalized_fuzzy, _raw_fuzzy
+	if _normalized_index is None:
+		_normalized_index = _build_normalized_index()
+		_normalized_fuzzy = _NgramIndex(_normalized_index.keys())
+		_raw_fuzzy = _NgramIndex(word_to_images.keys())
+
+
 def _tokenize_words(text: str):
 	# Keep latin letters + numbers (3aslema, mar2a, etc.)
 	return re.findall(r"[a-z0-9]+", text.lower())
 
 
-def get_sign_for_word(word: str):
-	if not word:
+def is_sign_variant(size: str, ext: str) -> bool:
+	if size not in SIGN_SIZES or ext not in SIGN_FORMATS:
+		return False
+	return ext != "webp" or WEBP_AVAILABLE
+
+
+def _get_encoded_image(word: str, index: int, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	"""Return encoded bytes for one variant of word_to_images[word][index], encoding it at most once."""
+	key = (word, index, size, ext)
+	with _encoded_cache_lock:
+		cached = _encoded_cache.get(key)
+		if cached is not None:
+			_encoded_cache.move_to_end(key)
+			_encoded_cache_stats["hits"] += 1
+			return cached
+		_encoded_cache_stats["misses"] += 1
+
+	encoded = _encode_frame(word_to_images[word][index], size, ext)
+	if encoded is None:
 		return None
 
-	global _normalized_index
-	if _normalized_index is None:
-		_normalized_index = _build_normalized_index()
+	with _encoded_cache_lock:
+		_encoded_cache[key] = encoded
+		_encoded_cache.move_to_end(key)
+		while len(_encoded_cache) > SIGN_CACHE_SIZE:
+			_encoded_cache.popitem(last=False)
+	return encoded
+
+
+def warm_sign_cache(variants=None):
+	"""Encode sign frames up front, stopping once SIGN_CACHE_SIZE entries are cached.
+
+	variants is an iterable of (size, ext) pairs; defaults to SIGN_CACHE_WARM
+	(the default variant unless configured). Returns the number of entries encoded.
+	"""
+	if variants is None:
+		variants = SIGN_CACHE_WARM
+	variants = [(size, ext) for size, ext in variants if is_sign_variant(size, ext)]
+	warmed = 0
+	for size, ext in variants:
+		for word, images in word_to_images.items():
+			for index in range(len(images)):
+				if warmed >= SIGN_CACHE_SIZE:
+					return warmed
+				if _get_encoded_image(word, index, size, ext) is not None:
+					warmed += 1
+	return warmed
+
+
+def get_sign_cache_stats():
+	with _encoded_cache_lock:
+		return {
+			"hits": _encoded_cache_stats["hits"],
+			"misses": _encoded_cache_stats["misses"],
+			"size": len(_encoded_cache),
+			"capacity": SIGN_CACHE_SIZE,
+		}
+
+
+@lru_cache(maxsize=RESOLVE_CACHE_SIZE)
+def _resolve_word(word: str):
+	"""Map a user token onto a key of word_to_images (exact, normalized, then fuzzy)."""
+	_ensure_indexes()
 
 	original = word.lower()
 	original = _apply_aliases(original)
-	images = word_to_images.get(original)
-	if not images:
-		normalized = _normalize_word(original)
-		# Direct match on normalized index
-		if normalized in _normalized_index:
-			candidate = _normalized_index[normalized][0]
-			images = word_to_images.get(candidate)
-		# Fuzzy match if still missing
-		if not images and normalized:
-			choices = list(_normalized_index.keys())
-			match = get_close_matches(normalized, choices, n=1, cutoff=FUZZY_CUTOFF)
-			if match:
-				candidate = _normalized_index[match[0]][0]
-				images = word_to_images.get(candidate)
+	if word_to_images.get(original):
+		return original
+
+	normalized = _normalize_word(original)
+	# Direct match on normalized index
+	if normalized in _normalized_index:
+		candidate = _normalized_index[normalized][0]
+		if word_to_images.get(candidate):
+			return candidate
+	# Fuzzy match if still missing
+	if normalized:
+		match = _normalized_fuzzy.best_match(normalized, FUZZY_CUTOFF)
+		if match:
+			candidate = _normalized_index[match][0]
+			if word_to_images.get(candidate):
+				return candidate
 
 	# Fallback: fuzzy match against raw keys
-	if not images:
-		match = get_close_matches(original, list(word_to_images.keys()), n=1, cutoff=FUZZY_CUTOFF)
-		if match:
-			images = word_to_images.get(match[0])
-	if images:
-		selected = choice(images)
-		print(f"DEBUG: Selected image type: {type(selected)}, is ndarray: {isinstance(selected, np.ndarray)}")
-		if isinstance(selected, np.ndarray):
-			print(f"DEBUG: Array shape: {selected.shape}, dtype: {selected.dtype}")
-		result = _array_to_base64(selected)
-		print(f"DEBUG: Conversion result type: {type(result)}, is None: {result is None}")
-		if result and isinstance(result, str):
-			print(f"DEBUG: Result starts with 'data:': {result.startswith('data:')}")
-		return result
+	match = _raw_fuzzy.best_match(original, FUZZY_CUTOFF)
+	if match and word_to_images.get(match):
+		return match
 	return None
 
 
-def get_signs_for_text(text: str):
-	if not text:
-		return []
+def _frame_hash(word: str, index: int):
+	key = (word, index)
+	with _hash_lock:
+		digest = _frame_hashes.get(key)
+	if digest is None:
+		digest = frame_digest(word_to_images[word][index])
+		with _hash_lock:
+			_frame_hashes[key] = digest
+	return digest
+
+
+def _sign_url(word: str, index: int, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	frame = word_to_images[word][index]
+	if isinstance(frame, str):
+		# Already a path or URL
+		return frame
+	if not isinstance(frame, np.ndarray):
+		return None
+	if not is_sign_variant(size, ext):
+		size, ext = DEFAULT_SIGN_SIZE, DEFAULT_SIGN_FORMAT
+	digest = _frame_hash(word, index)
+	if size == DEFAULT_SIGN_SIZE and ext == DEFAULT_SIGN_FORMAT:
+		return reverse("sign_image", args=[digest])
+	return reverse("sign_image_variant", args=[size, digest, ext])
+
+
+def _get_hash_index():
+	global _hash_index
+	if _hash_index is None:
+		with _hash_index_lock:
+			if _hash_index is None:
+				index = {}
+				for word, images in word_to_images.items():
+					for i, frame in enumerate(images):
+						if isinstance(frame, np.ndarray):
+							index[_frame_hash(word, i)] = (word, i)
+				_hash_index = index
+	return _hash_index
+
+
+def get_sign_image(digest: str, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	"""Return encoded bytes for the frame whose content hash is digest, or None."""
+	if not is_sign_variant(size, ext):
+		return None
+	key = _get_hash_index().get(digest)
+	if key is None:
+		return None
+	return _get_encoded_image(*key, size, ext)
+
+
+def get_sign_for_word(word: str, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	if not word:
+		return None
+
+	resolved = _resolve_word(word)
+	if resolved is None:
+		return None
+	images = word_to_images[resolved]
+	return _sign_url(resolved, randrange(len(images)), size, ext)
+
+
+def get_signs_for_texts(texts, max_workers=None, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	"""Batch version of get_signs_for_text: one result list per input text.
+
+	Tokens are deduplicated across all texts and resolved once; every
+	occurrence of a token shares the same frame. Images are returned as URLs of
+	the sign image endpoint for the requested size/format variant; frames whose
+	content hash is not known yet are hashed in parallel on a thread pool.
+	"""
+	tokenized = [_tokenize_words(text) if text else [] for text in texts]
+
+	selected = {}
+	for tokens in tokenized:
+		for token in tokens:
+			if token in selected:
+				continue
+			resolved = _resolve_word(token)
+			if resolved is None:
+				selected[token] = None
+			else:
+				selected[token] = (resolved, randrange(len(word_to_images[resolved])))
+
+	keys = {key for key in selected.values() if key is not None}
+	with _hash_lock:
+		misses = [
+			key for key in keys
+			if key not in _frame_hashes and isinstance(word_to_images[key[0]][key[1]], np.ndarray)
+		]
+	workers = max_workers or SIGN_ENCODE_WORKERS
+	if len(misses) > 1 and workers > 1:
+		with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+			list(pool.map(lambda key: _frame_hash(*key), misses))
+
+	encoded = {key: _sign_url(*key, size, ext) for key in keys}
 	results = []
-	for token in _tokenize_words(text):
-		img = get_sign_for_word(token)
-		if img:
-			results.append({"word": token, "image": img})
+	for tokens in tokenized:
+		signs = []
+		for token in tokens:
+			key = selected[token]
+			img = encoded.get(key) if key is not None else None
+			if img:
+				signs.append({"word": token, "image": img})
+		results.append(signs)
 	return results
 
+
+def get_signs_for_text(text: str, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+	if not text:
+		return []
+	return get_signs_for_texts([text], size=size, ext=ext)[0]
+
+
+if SIGN_CACHE_EAGER:
+	warm_sign_cache()
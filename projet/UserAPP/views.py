@@ -1,25 +1,30 @@
 from email.mime import text
 from multiprocessing import context
 import os
-import random
 import sys
 from pathlib import Path
-from PIL import Image
 
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.models import User
 from django.core.files.storage import FileSystemStorage
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
-import torch
 from .models import Event, UserProfile, Reclamation, WebAuthnCredential
-from .utils_sign import get_signs_for_text
+from .utils_sign import (
+    DEFAULT_SIGN_FORMAT,
+    DEFAULT_SIGN_SIZE,
+    SIGN_FORMATS,
+    get_sign_for_word,
+    get_sign_image,
+    get_signs_for_text,
+    is_sign_variant,
+)
 from .utils import arabic_to_latin  # si tu as ta fonction de translittération
 from .utils_face import compare_face_to_reference, get_enrollment_image_path
 
@@ -30,6 +35,15 @@ if str(REPO_ROOT) not in sys.path:
 
 from speech_to_text_vosk_web import convert_to_wav, transcribe_file, wav_has_audio
 
+ANIMATIONS_BACKEND_DIR = settings.BASE_DIR / 'sign-avatar' / 'backend'
+if str(ANIMATIONS_BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(ANIMATIONS_BACKEND_DIR))
+
+from animation_cache import AnimationCache
+import animation_format
+
+animation_cache = AnimationCache(str(ANIMATIONS_BACKEND_DIR / 'dataset_animations'))
+
 from fido2.server import Fido2Server
 from fido2.webauthn import (
     AttestedCredentialData,
@@ -59,6 +73,19 @@ def _superuser_required(view_func):
     return user_passes_test(lambda user: user.is_active and user.is_superuser, login_url="/signin/")(view_func)
 
 
+def _sign_variant_for_request(request):
+    # Clients may pick a variant explicitly (e.g. mobile: sign_size=medium);
+    # otherwise serve WebP to browsers that advertise support for it.
+    size = request.POST.get("sign_size") or request.GET.get("sign_size") or DEFAULT_SIGN_SIZE
+    ext = request.POST.get("sign_format") or request.GET.get("sign_format")
+    if not ext:
+        ext = "webp" if "image/webp" in request.headers.get("Accept", "") else DEFAULT_SIGN_FORMAT
+    if not is_sign_variant(size, ext):
+        size = size if is_sign_variant(size, DEFAULT_SIGN_FORMAT) else DEFAULT_SIGN_SIZE
+        ext = DEFAULT_SIGN_FORMAT
+    return size, ext
+
+
 def home(request):
     return render(request, "index.html")
 
@@ -73,7 +100,8 @@ def transcribe(request):
             context["text"] = text_input
             translit_word = arabic_to_latin(text_input)
             context["translit"] = translit_word
-            context["sign_images"] = get_signs_for_text(translit_word)
+            size, ext = _sign_variant_for_request(request)
+            context["sign_images"] = get_signs_for_text(translit_word, size=size, ext=ext)
             return render(request, "transcribe.html", context)
         
         audio_file = request.FILES.get("audio")
@@ -109,7 +137,8 @@ def transcribe(request):
                 sign_image = get_sign_for_word(translit_word)
 
                 context["translit"] = translit_word
-                context["sign_images"] = get_signs_for_text(translit_word)
+                size, ext = _sign_variant_for_request(request)
+                context["sign_images"] = get_signs_for_text(translit_word, size=size, ext=ext)
                 context["sign_image"] = sign_image
 
 
@@ -126,18 +155,22 @@ def transcribe(request):
 
     return render(request, "transcribe.html", context)
 
-def get_sign_for_word(word):
-    model_path = settings.BASE_DIR / "sign_model_and_images.pth"
-    package = torch.load(model_path, map_location="cpu", weights_only=False)
-    images = package["word_to_images"].get(word.lower())
-    if images:
-        img_array = random.choice(images)
-        temp_dir = settings.MEDIA_ROOT / "temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        img_path = temp_dir / f"{word}.jpg"
-        Image.fromarray(img_array).save(img_path)
-        return str(img_path)
-    return None
+@require_GET
+def sign_image(request, digest, size=DEFAULT_SIGN_SIZE, ext=DEFAULT_SIGN_FORMAT):
+    # Sign frames are addressed by content hash, so a URL never changes content.
+    if not is_sign_variant(size, ext):
+        raise Http404("Unknown sign image variant.")
+    etag = f'"{digest}-{size}.{ext}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        data = get_sign_image(digest, size, ext)
+        if data is None:
+            raise Http404("Unknown sign image.")
+        response = HttpResponse(data, content_type=SIGN_FORMATS[ext][1])
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 def show_avatar(request):
@@ -152,7 +185,6 @@ def show_avatar(request):
 
 
 from django.shortcuts import render
-from .utils_sign import get_sign_for_word
 from .utils import arabic_to_latin
 
 import json
@@ -527,15 +559,15 @@ def get_animation(request):
         try:
             data = json.loads(request.body)
             word = data.get('word', '').lower().strip()
+            fmt = data.get('format', 'json')
             
-            # Construct path to animations
-            animations_dir = settings.BASE_DIR / 'sign-avatar' / 'backend' / 'dataset_animations'
-            json_path = animations_dir / f"{word}.json"
-            
-            if json_path.exists():
-                with open(json_path, "r", encoding='utf-8') as f:
-                    animation_data = json.load(f)
-                return JsonResponse(animation_data, safe=False)
+            # Animations come from the shared cache as ready-to-send JSON bytes;
+            # "format": "sanm" returns the compact binary form instead.
+            entry = animation_cache.get(word) if word else None
+            if entry is not None:
+                if fmt == 'sanm':
+                    return HttpResponse(entry.binary, content_type=animation_format.CONTENT_TYPE)
+                return HttpResponse(entry.payload, content_type="application/json")
             else:
                 return JsonResponse([], safe=False) # Return empty list if not found
         except Exception as e:
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import animation_format
+
+
+class AnimationEntry:
+    """One loaded animation: parsed frames plus the JSON bytes to send as-is."""
+
+    def __init__(self, data, payload, mtime, size):
+        self.data = data
+        self.payload = payload
+        self.mtime = mtime
+        self.size = size
+        self._binary = None
+
+    @property
+    def binary(self):
+        """SANM encoding of the frames (see animation_format), built on first use."""
+        if self._binary is None:
+            self._binary = animation_format.encode(self.data)
+        return self._binary
+
+
+class AnimationCache:
+    """
+    Bounded LRU of dataset_animations/<word>.json keyed by word.
+
+    Each lookup stats the file and reloads it when its mtime or size changed,
+    so regenerated animations are picked up without a restart. Used by both
+    the Flask backend (/predict) and the Django /api/animation/ view.
+    """
+
+    def __init__(self, animations_dir, max_entries=256):
+        self.animations_dir = animations_dir
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, word):
+        return os.path.join(self.animations_dir, f"{word}.json")
+
+    def get(self, word):
+        """Return the AnimationEntry for word, or None if no file exists."""
+        path = self.path_for(word)
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(word, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(word)
+            if entry is not None and entry.mtime == st.st_mtime_ns and entry.size == st.st_size:
+                self._entries.move_to_end(word)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with open(path, "rb") as f:
+            payload = f.read()
+        data = json.loads(payload.decode("utf-8"))
+        entry = AnimationEntry(data, payload, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            self._entries[word] = entry
+            self._entries.move_to_end(word)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, word=None):
+        with self._lock:
+            if word is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(word, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "capacity": self.max_entries,
+            }
@@ -0,0 +1,149 @@
+"""
+Compact binary format for bone animations ("SANM").
+
+The JSON written by process_video repeats every bone and axis name in every
+frame. This format stores the same data as a frames x bones x 3 (x, y, z)
+array behind a small header:
+
+    magic      4 bytes   b"SANM"
+    version    uint8     1, or 2 when frame timestamps are present
+    itemsize   uint8     2 (float16) or 4 (float32)
+    bones      uint16    number of bones
+    frames     uint32    number of frames
+    names_len  uint32    length of the bone name block
+    names      utf-8 bone names joined by "\\n", zero-padded to 4 bytes
+    times      version 2 only: float32 seconds, one per frame
+    values     little-endian floats, frames * bones * 3
+
+All header integers are little-endian. The JSON frame list can always be
+rebuilt with to_frames(), so JSON stays available as a compatibility view.
+Timestamps come from the "t" key written by keyframes.postprocess.
+
+The servers never read .sanm files: /predict and /api/animation/ encode
+SANM in memory from the JSON (see AnimationCache). The converter below is
+for offline use only, e.g. shipping animations to a client bundle; its
+default output directory, dataset_animations_sanm, is not tracked.
+
+Usage:
+    python animation_format.py [dataset_animations] [output_dir] [--float32]
+"""
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"SANM"
+VERSION = 1
+TIMED_VERSION = 2
+TIME_KEY = "t"
+AXES = ("x", "y", "z")
+CONTENT_TYPE = "application/octet-stream"
+_HEADER = struct.Struct("<4sBBHII")
+_DTYPES = {2: np.dtype("<f2"), 4: np.dtype("<f4")}
+
+
+def frames_to_array(frames):
+    """Convert a list of {bone: {x, y, z}} dicts into (bone_names, array)."""
+    bones = []
+    seen = set()
+    for frame in frames:
+        for bone, rot in frame.items():
+            if isinstance(rot, dict) and bone not in seen:
+                seen.add(bone)
+                bones.append(bone)
+
+    values = np.zeros((len(frames), len(bones), 3), dtype=np.float32)
+    column = {bone: i for i, bone in enumerate(bones)}
+    for f, frame in enumerate(frames):
+        for bone, rot in frame.items():
+            if not isinstance(rot, dict):
+                continue
+            row = values[f, column[bone]]
+            for a, axis in enumerate(AXES):
+                row[a] = rot.get(axis, 0.0)
+    return bones, values
+
+
+def to_frames(bones, values, times=None):
+    """Rebuild the JSON-style frame list from (bone_names, array[, times])."""
+    values = np.asarray(values, dtype=np.float64)
+    frames = [
+        {
+            bone: {axis: float(values[f, b, a]) for a, axis in enumerate(AXES)}
+            for b, bone in enumerate(bones)
+        }
+        for f in range(values.shape[0])
+    ]
+    if times is not None:
+        for frame, t in zip(frames, times):
+            frame[TIME_KEY] = round(float(t), 4)
+    return frames
+
+
+def encode(frames, dtype="float16"):
+    """Serialize a JSON-style frame list into SANM bytes."""
+    bones, values = frames_to_array(frames)
+    np_dtype = np.dtype(dtype).newbyteorder("<")
+    if np_dtype.itemsize not in _DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+    timed = bool(frames) and all(TIME_KEY in frame for frame in frames)
+    names = "\n".join(bones).encode("utf-8")
+    names += b"\0" * (-(_HEADER.size + len(names)) % 4)
+    header = _HEADER.pack(
+        MAGIC, TIMED_VERSION if timed else VERSION, np_dtype.itemsize, len(bones), len(frames), len(names)
+    )
+    times = b""
+    if timed:
+        times = np.array([frame[TIME_KEY] for frame in frames], dtype="<f4").tobytes()
+    return header + names + times + values.astype(np_dtype).tobytes()
+
+
+def decode(payload):
+    """
+    Parse SANM bytes into (bone_names, frames x bones x 3 float32 array, times).
+    times is None unless the animation carries frame timestamps.
+    """
+    magic, version, itemsize, bone_count, frame_count, names_len = _HEADER.unpack_from(payload, 0)
+    if magic != MAGIC or version not in (VERSION, TIMED_VERSION) or itemsize not in _DTYPES:
+        raise ValueError("Not a SANM animation")
+
+    offset = _HEADER.size
+    names = bytes(payload[offset:offset + names_len]).rstrip(b"\0").decode("utf-8")
+    bones = names.split("\n") if bone_count else []
+    offset += names_len
+
+    times = None
+    if version == TIMED_VERSION:
+        times = np.frombuffer(payload, dtype="<f4", count=frame_count, offset=offset)
+        offset += times.nbytes
+
+    values = np.frombuffer(payload, dtype=_DTYPES[itemsize], count=frame_count * bone_count * 3, offset=offset)
+    return bones, values.reshape(frame_count, bone_count, 3).astype(np.float32), times
+
+
+def convert_directory(src_dir, dst_dir, dtype="float16"):
+    """Write a .sanm into dst_dir for every .json animation found in src_dir."""
+    os.makedirs(dst_dir, exist_ok=True)
+    count = 0
+    for name in sorted(os.listdir(src_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(src_dir, name), "r", encoding="utf-8") as f:
+            frames = json.load(f)
+        out_path = os.path.join(dst_dir, os.path.splitext(name)[0] + ".sanm")
+        with open(out_path, "wb") as f:
+            f.write(encode(frames, dtype))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    here = os.path.dirname(os.path.abspath(__file__))
+    src = args[0] if args else os.path.join(here, "dataset_animations")
+    dst = args[1] if len(args) > 1 else os.path.join(here, "dataset_animations_sanm")
+    dtype = "float32" if "--float32" in sys.argv else "float16"
+    print(f"Converted {convert_directory(src, dst, dtype)} animations to {dst}")
@@ -0,0 +1,123 @@
+"""
+Compare extraction profiles: seconds per video and bone-angle error against a
+reference profile, to pick the fastest acceptable setting for on-demand
+extraction.
+
+    python benchmark_extraction.py --profiles quality balanced fast --limit 10
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from extract_motion import (
+    DEFAULT_PROFILE, EXTRACTION_PROFILES, SMOOTHED_CHANNELS,
+    extract_landmarks, find_videos, get_profile, make_pose, retarget_channels,
+)
+
+# Twist channels (x) are always 0 and would only dilute the averages
+COMPARED_CHANNELS = [i for i, (_bone, axis) in enumerate(SMOOTHED_CHANNELS) if axis != "x"]
+
+
+def angle_errors(reference, candidate):
+    """
+    Absolute angle differences (radians) between two (landmarks, frame_indices, fps)
+    extractions of the same video. The candidate's channels are interpolated
+    at the reference frames it covers. Returns (errors, coverage).
+    """
+    ref_landmarks, ref_indices, ref_fps = reference
+    cand_landmarks, cand_indices, cand_fps = candidate
+    if not len(ref_indices) or not len(cand_indices):
+        return np.zeros(0), 0.0
+    ref_channels = retarget_channels(ref_landmarks, ref_indices / ref_fps)
+    cand_channels = retarget_channels(cand_landmarks, cand_indices / cand_fps)
+    covered = (ref_indices >= cand_indices[0]) & (ref_indices <= cand_indices[-1])
+    diffs = np.stack([
+        np.interp(ref_indices[covered], cand_indices, cand_channels[:, c]) - ref_channels[covered, c]
+        for c in COMPARED_CHANNELS
+    ])
+    # Wrap so a yaw flipping between +pi and -pi counts as a small difference
+    errors = np.abs((diffs + math.pi) % (2 * math.pi) - math.pi)
+    return errors.ravel(), covered.mean()
+
+
+def run_benchmark(videos, profiles, reference=DEFAULT_PROFILE):
+    """
+    Extract every video with every profile (one Pose per profile, reused).
+    Returns {profile_name: summary dict}.
+    """
+    names = [reference] + [name for name in profiles if name != reference]
+    extractions = {}
+    seconds = {}
+    for name in names:
+        settings = get_profile(name)
+        pose = make_pose(settings)
+        try:
+            extractions[name], seconds[name] = [], []
+            for video in videos:
+                start = time.perf_counter()
+                extractions[name].append(extract_landmarks(video, pose, settings))
+                seconds[name].append(time.perf_counter() - start)
+        finally:
+            pose.close()
+        print(f"  {name}: {sum(seconds[name]):.1f}s for {len(videos)} videos")
+
+    ref_time = np.mean(seconds[reference])
+    summary = {}
+    for name in names:
+        errors, coverage = [], []
+        for ref, cand in zip(extractions[reference], extractions[name]):
+            err, cov = angle_errors(ref, cand)
+            errors.append(err)
+            coverage.append(cov)
+        errors = np.degrees(np.concatenate(errors)) if errors else np.zeros(0)
+        per_video = float(np.mean(seconds[name]))
+        summary[name] = {
+            "settings": get_profile(name),
+            "seconds_per_video": per_video,
+            "speedup": float(ref_time / per_video) if per_video else math.inf,
+            "mean_error_deg": float(errors.mean()) if errors.size else None,
+            "p95_error_deg": float(np.percentile(errors, 95)) if errors.size else None,
+            "max_error_deg": float(errors.max()) if errors.size else None,
+            "coverage": float(np.mean(coverage)) if coverage else 0.0,
+        }
+    return summary
+
+
+def print_summary(summary, reference):
+    print(f"\n{'profile':<10} {'s/video':>8} {'speedup':>8} {'mean°':>7} {'p95°':>7} {'max°':>7} {'cover':>6}")
+    fmt = lambda v: f"{v:7.2f}" if v is not None else "      -"
+    for name, row in summary.items():
+        label = f"{name}*" if name == reference else name
+        print(f"{label:<10} {row['seconds_per_video']:8.2f} {row['speedup']:7.1f}x "
+              f"{fmt(row['mean_error_deg'])} {fmt(row['p95_error_deg'])} {fmt(row['max_error_deg'])} "
+              f"{row['coverage']:6.0%}")
+    print(f"* reference; errors are bone-angle differences against {reference} over the covered frames")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark extraction profiles.")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(EXTRACTION_PROFILES),
+                        default=sorted(EXTRACTION_PROFILES))
+    parser.add_argument("--reference", choices=sorted(EXTRACTION_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--videos", nargs="*", help="video files (default: dataset_videos)")
+    parser.add_argument("--limit", type=int, default=10, help="number of dataset videos to use")
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    videos = args.videos
+    if not videos:
+        video_dir = os.path.join(os.path.dirname(__file__), "dataset_videos")
+        videos = sorted(v["path"] for v in find_videos(video_dir))[:args.limit]
+    if not videos:
+        parser.error("no videos to benchmark")
+
+    print(f"Benchmarking {len(videos)} videos...")
+    summary = run_benchmark(videos, args.profiles, args.reference)
+    print_summary(summary, args.reference)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=1)
@@ -0,0 +1,96 @@
+"""
+Accuracy parity and latency of the int8 (optionally traced) SignLangCNN
+against the fp32 model:
+
+    python benchmark_sign_model.py --clips 64 --frames 16 --batch 1 8
+
+Without --data the clips are random frames, which only shows how far the
+quantized outputs drift; pass real clips (an .npz with a "clips" array of
+shape (n, time, 3, 70, 70)) for a meaningful agreement figure.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+import torch
+
+from sign_inference import batched_forward, parity_report
+from sign_model import INPUT_SIZE, SignLangCNN, load_model, quantize_model
+
+
+def latency(model, clips, batch_size, repeats=5):
+    """Median seconds per batch of batch_size clips (after one warm-up pass)."""
+    batches = [clips[i:i + batch_size] for i in range(0, len(clips) - batch_size + 1, batch_size)]
+    with torch.inference_mode():
+        batched_forward(model, batches[0])
+        timings = []
+        for _ in range(repeats):
+            for batch in batches:
+                start = time.perf_counter()
+                batched_forward(model, batch)
+                timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the quantized sign classifier.")
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(__file__), "signlang_cnnlstm.pth"),
+                        help="fp32 weights (random init if missing)")
+    parser.add_argument("--data", help=".npz with a 'clips' array (n, time, 3, 70, 70)")
+    parser.add_argument("--clips", type=int, default=64, help="number of random clips")
+    parser.add_argument("--frames", type=int, default=16, help="frames per random clip")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    try:
+        fp32 = load_model(args.model)
+    except (OSError, RuntimeError) as e:
+        print(f"WARNING: could not load {args.model} ({e}); using random weights")
+        fp32 = SignLangCNN().eval()
+
+    if args.data:
+        with np.load(args.data) as data:
+            clips = [torch.from_numpy(clip).float() for clip in data["clips"]]
+    else:
+        torch.manual_seed(0)
+        clips = [torch.rand(args.frames, 3, INPUT_SIZE, INPUT_SIZE) for _ in range(args.clips)]
+
+    skipped = [size for size in args.batch if size > len(clips)]
+    if skipped:
+        print(f"Skipping batch size(s) {', '.join(map(str, skipped))}: only {len(clips)} clips")
+    batch_sizes = [size for size in args.batch if size <= len(clips)]
+
+    variants = {
+        "fp32": fp32,
+        "int8": quantize_model(fp32),
+        "int8+trace": quantize_model(fp32, trace=True),
+    }
+    results = {}
+    for name, model in variants.items():
+        row = {"parity": parity_report(fp32, model, clips)}
+        for batch_size in batch_sizes:
+            seconds = latency(model, clips, batch_size)
+            row[f"batch_{batch_size}"] = {
+                "ms_per_batch": seconds * 1000,
+                "ms_per_clip": seconds / batch_size * 1000,
+                "clips_per_second": batch_size / seconds,
+            }
+        results[name] = row
+
+    print(f"{len(clips)} clips, {torch.get_num_threads()} threads")
+    header = f"{'model':<12} {'top1':>6} {'maxΔp':>8}" + "".join(f" {f'ms/clip@{b}':>11}" for b in batch_sizes)
+    print(header)
+    for name, row in results.items():
+        line = f"{name:<12} {row['parity']['top1_agreement']:6.1%} {row['parity']['max_prob_diff']:8.5f}"
+        line += "".join(f" {row[f'batch_{b}']['ms_per_clip']:11.2f}" for b in batch_sizes)
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
@@ -6,38 +6,59 @@ except ImportError as e:
     cv2 = None
     mp = None
 
+import contextlib
 import json
 import numpy as np
 import os
 import glob
 import math
+import time
+
+from keyframes import DEFAULT_FPS, TIME_KEY, postprocess
+from extraction_manifest import ExtractionManifest, file_sha256
+from stage_timer import StageTimer
+
+MANIFEST_NAME = ".manifest.json"
+TIMINGS_NAME = ".timings.json"
 
 # --- 1. Utilities for Math & Smoothing ---
 
-class OneEuroFilter:
-    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+# Bump whenever the extraction/retargeting math changes so that batch runs
+# regenerate outputs recorded in the manifest with an older version.
+EXTRACTOR_VERSION = 2
+FILTER_MIN_CUTOFF = 0.1
+FILTER_BETA = 0.05
+
+class OneEuroFilterBank:
+    """
+    One-Euro filter over a fixed set of channels (e.g. every bone/axis of a
+    pose), each channel smoothed independently with an adaptive cutoff.
+    filter() takes one value per channel.
+    Create one bank per extraction; it holds no global state.
+    """
+    def __init__(self, channels, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.channels = channels
         self.min_cutoff = min_cutoff
         self.beta = beta
         self.d_cutoff = d_cutoff
         self.x_prev = None
-        self.dx_prev = 0
+        self.dx_prev = None
         self.t_prev = None
 
-    def smoothing_factor(self, t_e, cutoff):
+    @staticmethod
+    def smoothing_factor(t_e, cutoff):
         r = 2 * math.pi * cutoff * t_e
         return r / (r + 1)
 
-    def exponential_smoothing(self, a, x, x_prev):
-        return a * x + (1 - a) * x_prev
-
     def filter(self, x, t=None):
+        x = np.asarray(x, dtype=np.float64)
         if self.t_prev is None:
             if t is None: t = 0
             self.t_prev = t
             self.x_prev = x
-            self.dx_prev = 0
+            self.dx_prev = np.zeros(self.channels)
             return x
-            
+
         if t is None:
             t = self.t_prev + 0.033 # Assume 30fps if no time provided
 
@@ -45,239 +66,686 @@ class OneEuroFilter:
         if t_e <= 0: return self.x_prev # Should not happen
 
         dx = (x - self.x_prev) / t_e
-        smoothed_dx = self.exponential_smoothing(self.smoothing_factor(t_e, self.d_cutoff), dx, self.dx_prev)
+        a_d = self.smoothing_factor(t_e, self.d_cutoff)
+        smoothed_dx = a_d * dx + (1 - a_d) * self.dx_prev
 
-        cutoff = self.min_cutoff + self.beta * abs(smoothed_dx)
-        smoothed_x = self.exponential_smoothing(self.smoothing_factor(t_e, cutoff), x, self.x_prev)
+        cutoff = self.min_cutoff + self.beta * np.abs(smoothed_dx)
+        a = self.smoothing_factor(t_e, cutoff)
+        smoothed_x = a * x + (1 - a) * self.x_prev
 
         self.x_prev = smoothed_x
         self.dx_prev = smoothed_dx
         self.t_prev = t
         return smoothed_x
 
-# Create a filter bank
-filters = {}
-def smooth_bone(name, axis, val):
-    key = f"{name}_{axis}"
-    if key not in filters:
-        filters[key] = OneEuroFilter(min_cutoff=0.1, beta=0.05) # Tuned for smoothness
-    return filters[key].filter(val)
+    def filter_sequence(self, xs, times=None):
+        """Filter a whole (frames, channels) array; returns the same shape."""
+        xs = np.asarray(xs, dtype=np.float64)
+        out = np.empty_like(xs)
+        for i in range(len(xs)):
+            out[i] = self.filter(xs[i], None if times is None else times[i])
+        return out
+
+# Channels smoothed per frame, in the order process_video fills them
+SMOOTHED_CHANNELS = (
+    ("RightArm", "x"), ("RightArm", "y"), ("RightArm", "z"),
+    ("LeftArm", "x"), ("LeftArm", "y"), ("LeftArm", "z"),
+    ("RightForeArm", "z"), ("LeftForeArm", "z"),
+)
+
+def make_filter_bank():
+    return OneEuroFilterBank(len(SMOOTHED_CHANNELS), min_cutoff=FILTER_MIN_CUTOFF, beta=FILTER_BETA) # Tuned for smoothness
 
 # --- 2. Vector Math for 3D Rotations ---
+# Everything below works on whole sequences: arrays of shape (frames, 3).
+
+# MediaPipe Pose landmark indices used for the arms
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+
+def to_space(v):
+    # MP World: Y is down and Z is relative depth.
+    # In 3D (ThreeJS), Y is Up, so invert Y and Z.
+    return v * np.array([1.0, -1.0, -1.0])
 
 def normalize(v):
-    norm = np.linalg.norm(v)
-    return v / norm if norm > 0 else v
+    norm = np.sqrt(np.einsum("ij,ij->i", v, v))[:, None]
+    return np.divide(v, norm, out=v.copy(), where=norm > 0)
 
-def get_euler_from_vector(v, side="right"):
+def get_euler_from_vectors(v, side="right"):
     """
-    Convert a bone vector to Euler angles (x, y, z) for a T-Pose character.
+    Convert bone vectors (frames, 3) to Euler angles for a T-Pose character.
+    Returns (x, y, z) arrays; x (twist) is always 0 since it cannot be
+    inferred without the elbow orientation.
     T-Pose Assumption:
     - Right Arm rests along +X axis.
     - Left Arm rests along -X axis.
+    Produces pure spherical rotations relative to the shoulder and lets
+    Avatar.js retarget/fix axes if needed: pitch (Up/Down) -> z, yaw
+    (Front/Back) -> y.
     """
     v = normalize(v)
-    x, y, z = v[0], v[1], v[2]
-    
-    # MediaPipe Coordinates (World):
-    # x: Right (+), Left (-)
-    # y: Top (-), Bottom (+)  <-- Note: In 3D graphics, Y is often UP. MP Y is DOWN.
-    # z: Camera (+?) or Depth. MP z is usually negative = forward?
-    # Actually MP World Landmarks: "y is pointing up". Wait checking docs...
-    # Docs: "World landmarks are in meters. The origin is the center of hips."
-    # Let's assume MP World: Y is UP? No usually Y is inverted image coords.
-    # Let's infer from data: Arms down -> Y increases properly.
-    
-    # We want to map to Three.js T-Pose:
-    # Right Arm (+X).
-    
-    # Calculate Yaw (rotation around Y-axis) and Pitch (rotation around Z-axis)
-    # This is a simplification. Ideally use Quaternions.
-    
-    # Basic Spherical Coords mapping
-    # Pitch (Z-rotation): Up/Down
-    # Yaw (Y-rotation): Forward/Back
-    
-    angle_y = 0
-    angle_z = 0
-    angle_x = 0 # Twist - hard to infer without elbows orientation, assume 0
-    
+    # Clip guards asin against rounding just above 1 on straight-up/down arms
+    sin_pitch = np.clip(v[:, 1], -1.0, 1.0)
     if side == "right":
-        # Vector points roughly +X
-        # Yaw (Horizontal): atan2(-z, x). 
-        #   If z is forward (+), and x is right (+), angle is 0.
-        # Pitch (Vertical): atan2(y, sqrt(x^2 + z^2))?
-        # Let's use simple logic relative to (1,0,0)
-        
-        # In Three.js for Right Arm:
-        # +Z rot = Arm goes UP (or Front?) -> Depends on Bone Axis.
-        # Mixamo RightArm: Z-axis rotation moves it Forward/Back? Y is Up/Down?
-        # Usually:
-        #   Z: Forward/Back (Horizontal Swing)
-        #   y: Twist
-        #   x: Up/Down (Vertical Swing) ?? 
-        #   Wait, Mixamo bones are weird.
-        #   Let's stick to standard math and let Avatar.js retarget/fix axes if needed.
-        #   Let's produce pure spherical rotations relative to shoulder.
-        
-        # Global Vector Direction (v)
-        # We need rotation R such that R * (1,0,0) = v
-        
-        pitch = -math.asin(v[1]) # Y component determines Up/Down angle
-        yaw = math.atan2(-v[2], v[0]) # Z, X components determine Front/Back
-        
-        # Output: x, y, z Eulers
-        # We'll map Pitch -> Z rotation, Yaw -> Y rotation?
-        return 0, yaw, pitch
-
+        # Relative to (1,0,0)
+        pitch = -np.arcsin(sin_pitch) # Y component determines Up/Down angle
+        yaw = np.arctan2(-v[:, 2], v[:, 0]) # Z, X components determine Front/Back
     elif side == "left":
         # Relative to (-1,0,0)
-        pitch = math.asin(v[1]) # Sign flip?
-        # If v[1] is positive (arm down), Pitch should be negative?
-        
-        yaw = math.atan2(v[2], -v[0]) # Relative to -X
-        
-        return 0, yaw, pitch
-        
-    return 0, 0, 0
+        pitch = np.arcsin(sin_pitch)
+        yaw = np.arctan2(v[:, 2], -v[:, 0])
+    else:
+        pitch = yaw = np.zeros(len(v))
+    return np.zeros(len(v)), yaw, pitch
+
+# Helper for Elbow Angle
+def calculate_angles(a, b, c):
+    """Angle at b (radians) of the triangles a-b-c, one per frame."""
+    ba = a - b
+    bc = c - b
+    norms = np.sqrt(np.einsum("ij,ij->i", ba, ba)) * np.sqrt(np.einsum("ij,ij->i", bc, bc))
+    cosine = np.einsum("ij,ij->i", ba, bc) / (norms + 1e-6)
+    return np.arccos(np.clip(cosine, -1.0, 1.0))
 
 # --- 3. Main Processing Function ---
+# Extraction runs in two phases: extract_landmarks() runs MediaPipe (slow) and
+# its output can be cached per video as .npz; retarget() turns landmarks into
+# bone rotations (fast), so tweaks to the math or smoothing only need phase 2.
 mp_pose = None
+mp_hands = None
 if mp:
     try:
         mp_pose = mp.solutions.pose
+        mp_hands = mp.solutions.hands
     except AttributeError:
         print("Warning: mediapipe.solutions not found. Try 'pip install mediapipe' again.")
         mp_pose = None
+        mp_hands = None
 
-def process_video(video_path):
-    if not cv2 or not mp or mp_pose is None:
-        print("Error: OpenCV or MediaPipe not functioning correctly.")
-        return []
+# Bump whenever extract_landmarks changes so cached .npz files are redone
+LANDMARKS_VERSION = 2
+NUM_LANDMARKS = 33
+NUM_HAND_LANDMARKS = 21
 
-    cap = cv2.VideoCapture(video_path)
+# Speed/quality trade-offs for pose extraction:
+#   model_complexity: MediaPipe Pose model (0 lite, 1 full, 2 heavy)
+#   downscale: frames are shrunk by this factor before pose estimation
+#   frame_stride: only every Nth frame is run through the model
+#   max_duration: stop after this many seconds of video (None = whole video)
+#   hands: also run MediaPipe Hands on the same decoded frames
+# "quality" is the reference: every full-resolution frame through the heavy model.
+EXTRACTION_PROFILES = {
+    "quality": {"model_complexity": 2, "downscale": 1, "frame_stride": 1, "max_duration": None, "hands": False},
+    "balanced": {"model_complexity": 1, "downscale": 1, "frame_stride": 1, "max_duration": None, "hands": False},
+    "fast": {"model_complexity": 1, "downscale": 2, "frame_stride": 2, "max_duration": None, "hands": False},
+    "fastest": {"model_complexity": 0, "downscale": 2, "frame_stride": 3, "max_duration": None, "hands": False},
+}
+DEFAULT_PROFILE = "quality"
 
-    frames_data = []
-    
+def get_profile(profile=None, **overrides):
+    """
+    Resolve a profile name (or a dict of settings) to a full settings dict.
+    Keyword overrides that are not None replace individual settings.
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, str):
+        if profile not in EXTRACTION_PROFILES:
+            raise ValueError(f"Unknown extraction profile '{profile}' (choose from {', '.join(EXTRACTION_PROFILES)})")
+        profile = EXTRACTION_PROFILES[profile]
+    settings = dict(EXTRACTION_PROFILES[DEFAULT_PROFILE])
+    settings.update(profile)
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    unknown = set(settings) - set(EXTRACTION_PROFILES[DEFAULT_PROFILE])
+    if unknown:
+        raise ValueError(f"Unknown extraction setting(s): {', '.join(sorted(unknown))}")
+    return settings
+
+def make_pose(profile=None):
     # Using Holistic (or Pose) with World Landmarks (Meters)
-    with mp_pose.Pose(
+    return mp_pose.Pose(
         static_image_mode=False,
-        model_complexity=2, # Best quality
+        model_complexity=get_profile(profile)["model_complexity"],
         smooth_landmarks=True, 
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5
-    ) as pose:
-        
-        global filters
-        filters = {} # Reset filters
-        
-        while cap.isOpened():
-            success, image = cap.read()
-            if not success: break
-            
-            # Convert BGR to RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = pose.process(image_rgb)
-            
-            if results.pose_world_landmarks:
-                lm = results.pose_world_landmarks.landmark
-                
-                # Helper to get numpy point
-                def p(idx): return np.array([lm[idx].x, lm[idx].y, lm[idx].z])
-                
-                # Indices:
-                # 11: Left Shoulder, 12: Right Shoulder
-                # 13: Left Elbow,    14: Right Elbow
-                # 15: Left Wrist,    16: Right Wrist
-                
-                # Vectors
-                # Note: MP World Y is negative-up (inverted)?
-                # Usually: Y is Down.
-                # So if Arm is Down, Y is positive.
-                # In 3D (ThreeJS), Y is Up.
-                # We need to invert Y and Z (MP Z is relative).
-                
-                # Remap to Standard 3D (Y-Up, Z-Front?)
-                def to_space(vec):
-                    return np.array([vec[0], -vec[1], -vec[2]]) 
-
-                # Right Arm
-                v_r_upper = to_space(p(14) - p(12)) # Elbow - Shoulder
-                v_r_lower = to_space(p(16) - p(14)) # Wrist - Elbow
-                
-                # Left Arm
-                v_l_upper = to_space(p(13) - p(11))
-                v_l_lower = to_space(p(15) - p(13))
-                
-                # Calculate Rotations
-                # Note: The mapping here (x,y,z output) must match what Avatar.js expects.
-                # Avatar.js takes these and does: quaternion.setFromEuler(x, y, z)
-                
-                # Right Upper
-                rx, ry, rz = get_euler_from_vector(v_r_upper, "right")
-                frame_data = {}
-                frame_data["RightArm"] = {
-                    "x": smooth_bone("RightArm", "x", 0), # Twist ignored for now
-                    "y": smooth_bone("RightArm", "y", ry),
-                    "z": smooth_bone("RightArm", "z", rz)
-                }
-                
-                # Left Upper
-                lx, ly, lz = get_euler_from_vector(v_l_upper, "left")
-                frame_data["LeftArm"] = {
-                    "x": smooth_bone("LeftArm", "x", 0),
-                    "y": smooth_bone("LeftArm", "y", ly),
-                    "z": smooth_bone("LeftArm", "z", lz)
-                }
-                
-                # Forearms (Simplified: Relative to Upper or Global?)
-                # Avatar.js usually applies local rotation.
-                # If we send Global orientation for Forearm, child inherits parent rotation...
-                # So we need Local Rotation = Inverse(ParentRot) * ChildGlobalRot
-                # That's complex math for this script. 
-                # HACK: Send Forearms as 0 for now (stiff arms) or simple bend?
-                # Alternative: Just set them flat to see if Shoulders track well first.
-                # User wants "like the video". We need forearm bend.
-                
-                # Simple Elbow Bend (Hinge):
-                # Angle between Upper and Lower vector.
-                angle_r = calculate_angle(p(12), p(14), p(16))
-                angle_l = calculate_angle(p(11), p(13), p(15))
-                
-                # Bend is usually around Z axis for T-pose arms?
-                # 0 = straight, PI/2 = 90 deg.
-                # Forearm resting is straight (0).
-                # Bend reduces angle from 180 (straight in MP) to <180?
-                # MP vectors: Straight arm -> angle 180 (PI). 90 deg bend -> PI/2.
-                # We want rotation from 0 (straight) to X (bend).
-                # bend = PI - angle.
-                
-                bend_r = math.pi - angle_r
-                bend_l = math.pi - angle_l
-
-                frame_data["RightForeArm"] = {"x": 0, "y": 0, "z": smooth_bone("RightForeArm", "z", bend_r)}
-                frame_data["LeftForeArm"] = {"x": 0, "y": 0, "z": smooth_bone("LeftForeArm", "z", -bend_l)} # Negative for Left?
-                
-                frames_data.append(frame_data)
-
-    cap.release()
+    )
+
+def make_hands(profile=None):
+    return mp_hands.Hands(
+        static_image_mode=False,
+        max_num_hands=2,
+        model_complexity=min(1, get_profile(profile)["model_complexity"]), # Hands only has 0 and 1
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+@contextlib.contextmanager
+def _open_video(video_path, pose, settings, hands=None):
+    """
+    Yields (cap, fps, pose, hands); creates and closes the detectors that are
+    not given. hands is None unless the profile enables it.
+    """
+    cap = cv2.VideoCapture(video_path)
+    owned = []
+    if pose is None:
+        pose = make_pose(settings)
+        owned.append(pose)
+    elif hasattr(pose, "reset"):
+        pose.reset() # Drop tracking state from the previous video
+    if not settings["hands"]:
+        hands = None
+    elif hands is None:
+        hands = make_hands(settings)
+        owned.append(hands)
+    elif hasattr(hands, "reset"):
+        hands.reset()
+    try:
+        yield cap, cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS, pose, hands
+    finally:
+        for detector in owned:
+            detector.close()
+        cap.release()
+
+def _hand_landmarks(results):
+    """
+    (2, 21, 3) float32 world landmarks, [Left, Right] by MediaPipe's
+    handedness label (which assumes a mirrored image); NaN where missing.
+    """
+    hands = np.full((2, NUM_HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+    if results.multi_hand_world_landmarks:
+        for handedness, lm in zip(results.multi_handedness, results.multi_hand_world_landmarks):
+            side = 0 if handedness.classification[0].label == "Left" else 1
+            hands[side] = [(p.x, p.y, p.z) for p in lm.landmark]
+    return hands
+
+def _iter_landmarks(cap, fps, pose, settings, timer=None, hands=None):
+    """
+    Yields (frame_index, (33, 3) float32 world landmarks, hand landmarks) per
+    detected frame. Each frame is decoded and converted once and then handed
+    to every detector; hand landmarks (see _hand_landmarks) are None without
+    a hands detector.
+    Time spent per stage (grab, read, resize, convert, pose, hands) goes to timer.
+    """
+    stride = max(1, int(settings["frame_stride"]))
+    downscale = settings["downscale"]
+    max_frames = int(settings["max_duration"] * fps) if settings["max_duration"] else None
+    frame_index = -1
+    if timer is None:
+        timer = StageTimer()
+    clock = time.perf_counter
+
+    while cap.isOpened():
+        frame_index += 1
+        if max_frames is not None and frame_index >= max_frames:
+            break
+        start = clock()
+        if frame_index % stride:
+            # Skipped frames are only grabbed, not decoded
+            grabbed = cap.grab()
+            timer.add("grab", clock() - start)
+            if not grabbed: break
+            continue
+        success, image = cap.read()
+        timer.add("read", clock() - start)
+        if not success: break
+
+        if downscale and downscale > 1:
+            # World landmarks are in meters, so a smaller input only costs accuracy
+            start = clock()
+            h, w = image.shape[:2]
+            image = cv2.resize(image, (max(1, int(w / downscale)), max(1, int(h / downscale))),
+                               interpolation=cv2.INTER_AREA)
+            timer.add("resize", clock() - start)
+
+        # Convert BGR to RGB
+        start = clock()
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        mid = clock()
+        results = pose.process(image_rgb)
+        end = clock()
+        timer.add("convert", mid - start)
+        timer.add("pose", end - mid)
+
+        if results.pose_world_landmarks:
+            hand_lm = None
+            if hands is not None:
+                start = clock()
+                hand_lm = _hand_landmarks(hands.process(image_rgb))
+                timer.add("hands", clock() - start)
+            lm = results.pose_world_landmarks.landmark
+            yield frame_index, np.array([(p.x, p.y, p.z) for p in lm], dtype=np.float32), hand_lm
+
+def _stack_hands(hand_landmarks):
+    if not hand_landmarks or hand_landmarks[0] is None:
+        return None
+    return np.array(hand_landmarks, dtype=np.float32).reshape(-1, 2, NUM_HAND_LANDMARKS, 3)
+
+def extract_tracks(video_path, pose=None, profile=None, timer=None, hands=None):
+    """
+    Same as extract_landmarks, plus the hand track when the profile enables
+    hands: returns (landmarks, frame_indices, fps, hand_landmarks) where
+    hand_landmarks is a float32 (frames, 2, 21, 3) array aligned with
+    landmarks (NaN for undetected hands), or None.
+    """
+    settings = get_profile(profile)
+    with _open_video(video_path, pose, settings, hands) as (cap, fps, pose, hands):
+        detected = list(_iter_landmarks(cap, fps, pose, settings, timer, hands))
+
+    landmarks = np.array([lm for _, lm, _ in detected], dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+    frame_indices = np.array([frame_index for frame_index, _, _ in detected], dtype=np.int32)
+    hand_landmarks = _stack_hands([hand_lm for _, _, hand_lm in detected]) if settings["hands"] else None
+    return landmarks, frame_indices, float(fps), hand_landmarks
+
+def extract_landmarks(video_path, pose=None, profile=None, timer=None):
+    """
+    Run MediaPipe Pose over a video.
+
+    Returns (landmarks, frame_indices, fps): a float32 (frames, 33, 3) array
+    of world landmarks for every frame where a pose was detected, and the
+    index of each of those frames in the video.
+    profile (see EXTRACTION_PROFILES) trades accuracy for speed.
+    pose lets a caller reuse one Pose instance across videos (it is reset
+    first and must match the profile's model_complexity); by default a new
+    one is created and closed here.
+    timer (a StageTimer) collects per-stage timings if given.
+    """
+    return extract_tracks(video_path, pose, profile, timer)[:3]
+
+def save_landmarks(path, video_path, landmarks, frame_indices, fps, profile=None, hands=None):
+    """
+    Write landmarks (and the hand track, if any) as a compressed .npz, tagged
+    with the source video and profile.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    extra = {"hands": hands} if hands is not None else {}
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            **extra,
+            landmarks=landmarks,
+            frame_indices=frame_indices,
+            fps=np.float64(fps),
+            version=np.int32(LANDMARKS_VERSION),
+            video_size=np.int64(os.path.getsize(video_path)),
+            video_sha256=np.str_(file_sha256(video_path)),
+            profile=np.str_(json.dumps(get_profile(profile), sort_keys=True)),
+        )
+    os.replace(tmp_path, path)
+
+def load_landmarks(path, video_path=None, profile=None):
+    """
+    Read a .npz written by save_landmarks. Returns (landmarks, frame_indices,
+    fps), or None if the file is missing, outdated, was extracted with a
+    different profile or - when video_path is given - from different video
+    content.
+    """
+    try:
+        with np.load(path) as data:
+            if int(data["version"]) != LANDMARKS_VERSION:
+                return None
+            if json.loads(str(data["profile"])) != get_profile(profile):
+                return None
+            if video_path is not None and (
+                int(data["video_size"]) != os.path.getsize(video_path)
+                or str(data["video_sha256"]) != file_sha256(video_path)
+            ):
+                return None
+            return data["landmarks"], data["frame_indices"], float(data["fps"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def load_hands(path):
+    """The (frames, 2, 21, 3) hand track saved next to the landmarks, or None."""
+    try:
+        with np.load(path) as data:
+            return data["hands"] if "hands" in data.files else None
+    except (OSError, ValueError):
+        return None
+
+def bone_channels(landmarks):
+    """
+    Raw (unsmoothed) bone rotations for a (frames, 33, 3) landmark sequence, as
+    a (frames, len(SMOOTHED_CHANNELS)) array in SMOOTHED_CHANNELS order.
+    """
+    P = np.asarray(landmarks, dtype=np.float64)
+
+    # Right Arm
+    v_r_upper = to_space(P[:, RIGHT_ELBOW] - P[:, RIGHT_SHOULDER]) # Elbow - Shoulder
+    # Left Arm
+    v_l_upper = to_space(P[:, LEFT_ELBOW] - P[:, LEFT_SHOULDER])
+
+    # Calculate Rotations
+    # Note: The mapping here (x,y,z output) must match what Avatar.js expects.
+    # Avatar.js takes these and does: quaternion.setFromEuler(x, y, z)
+    _, ry, rz = get_euler_from_vectors(v_r_upper, "right")
+    _, ly, lz = get_euler_from_vectors(v_l_upper, "left")
+
+    # Forearms: a full local rotation (Inverse(ParentRot) * ChildGlobalRot)
+    # is not computed; send a simple elbow bend (hinge) instead.
+    # MP vectors: Straight arm -> angle 180 (PI). 90 deg bend -> PI/2.
+    # We want rotation from 0 (straight) to X (bend): bend = PI - angle.
+    bend_r = math.pi - calculate_angles(P[:, RIGHT_SHOULDER], P[:, RIGHT_ELBOW], P[:, RIGHT_WRIST])
+    bend_l = math.pi - calculate_angles(P[:, LEFT_SHOULDER], P[:, LEFT_ELBOW], P[:, LEFT_WRIST])
+
+    # Twist (x) ignored for now; Left forearm bend negated (Negative for Left?)
+    zeros = np.zeros(len(P))
+    return np.stack([zeros, ry, rz, zeros, ly, lz, bend_r, -bend_l], axis=1)
+
+def retarget_channels(landmarks, times=None):
+    """
+    Smoothed bone_channels() for a whole landmark sequence. times (seconds,
+    one per frame) drive the filter; without them frames are assumed to be
+    DEFAULT_FPS apart.
+    """
+    if not len(landmarks):
+        return np.zeros((0, len(SMOOTHED_CHANNELS)))
+    return make_filter_bank().filter_sequence(bone_channels(landmarks), times)
+
+def _make_frame(s):
+    return {
+        "RightArm": {"x": s[0], "y": s[1], "z": s[2]},
+        "LeftArm": {"x": s[3], "y": s[4], "z": s[5]},
+        "RightForeArm": {"x": 0, "y": 0, "z": s[6]},
+        "LeftForeArm": {"x": 0, "y": 0, "z": s[7]},
+    }
+
+def finish_frames(frames, target_fps=None, keyframe_tolerance=None):
+    """
+    Turn the timestamped frames yielded by stream_video into the stored
+    animation: post-processed when target_fps / keyframe_tolerance are set,
+    otherwise the plain per-frame list without "t", which players step
+    through at DEFAULT_FPS. Frames further apart than that (frame_stride > 1,
+    or gaps where no pose was detected) are resampled to DEFAULT_FPS first so
+    the animation keeps the video's duration.
+    """
+    if target_fps or keyframe_tolerance is not None:
+        return postprocess(frames, None, target_fps, keyframe_tolerance)
+    times = [frame.get(TIME_KEY) for frame in frames]
+    if len(times) > 1 and None not in times and np.diff(times).max() > 1.5 / DEFAULT_FPS:
+        frames = postprocess(frames, None, DEFAULT_FPS)
+    return [{k: v for k, v in frame.items() if k != TIME_KEY} for frame in frames]
+
+def _timed_frames(landmarks, frame_indices, fps):
+    if frame_indices is None:
+        frame_indices = np.arange(len(landmarks))
+    # Frames without landmarks (or skipped by frame_stride) are missing, so keep real timing
+    times = [frame_index / fps for frame_index in np.asarray(frame_indices).tolist()]
+    frames_data = [_make_frame(s) for s in retarget_channels(landmarks, times).tolist()]
+    for frame_data, t in zip(frames_data, times):
+        frame_data[TIME_KEY] = t
     return frames_data
 
-# Helper for Elbow Angle
-def calculate_angle(a, b, c):
-    a, b, c = np.array(a), np.array(b), np.array(c)
-    ba = a - b
-    bc = c - b
-    cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-    return np.arccos(np.clip(cosine, -1.0, 1.0))
+def retarget(landmarks, frame_indices=None, fps=DEFAULT_FPS, target_fps=None, keyframe_tolerance=None):
+    """
+    Compute the animation frames for a whole (frames, 33, 3) landmark sequence.
+
+    frame_indices (position of each landmark frame in the video) give the
+    real time of each frame for smoothing and for the stored timing.
+    """
+    return finish_frames(_timed_frames(landmarks, frame_indices, fps), target_fps, keyframe_tolerance)
+
+def stream_video(video_path, pose=None, landmarks_path=None, profile=None, timer=None):
+    """
+    Generator version of process_video: yields each frame, with its "t"
+    timestamp in seconds, as soon as it has been computed. Frames are not
+    post-processed; pass the collected list to finish_frames() for that.
+    Landmarks are written to landmarks_path (if given) once the video is
+    done, and read from it instead of running MediaPipe when still valid.
+    timer (a StageTimer) collects per-stage timings if given.
+    """
+    if timer is None:
+        timer = StageTimer()
+    with timer.time("cache"):
+        cached = load_landmarks(landmarks_path, video_path, profile) if landmarks_path else None
+    if cached is not None:
+        with timer.time("math"):
+            frames = _timed_frames(*cached)
+        yield from frames
+        return
+    if not cv2 or not mp or mp_pose is None:
+        print("Error: OpenCV or MediaPipe not functioning correctly.")
+        return
+
+    settings = get_profile(profile)
+    smoother = make_filter_bank() # Fresh filter state for this video only
+    landmarks, frame_indices, hand_landmarks = [], [], []
+    with _open_video(video_path, pose, settings) as (cap, fps, pose, hands):
+        for frame_index, lm, hand_lm in _iter_landmarks(cap, fps, pose, settings, timer, hands):
+            start = time.perf_counter()
+            landmarks.append(lm)
+            frame_indices.append(frame_index)
+            hand_landmarks.append(hand_lm)
+            t = frame_index / fps
+            frame_data = _make_frame(smoother.filter(bone_channels(lm[None])[0], t).tolist())
+            frame_data[TIME_KEY] = t
+            timer.add("math", time.perf_counter() - start)
+            yield frame_data
 
+    if landmarks_path:
+        landmarks = np.array(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        with timer.time("cache"):
+            save_landmarks(landmarks_path, video_path, landmarks, np.array(frame_indices, dtype=np.int32),
+                           float(fps), profile=settings, hands=_stack_hands(hand_landmarks))
+
+def process_video(video_path, target_fps=None, keyframe_tolerance=None, pose=None, landmarks_path=None,
+                  profile=None, timer=None):
+    """
+    Extract per-frame bone rotations from a video.
+
+    target_fps / keyframe_tolerance (radians) enable the optional
+    keyframes.postprocess stage; the resulting frames then carry a "t"
+    timestamp so players can interpolate between them.
+    With landmarks_path, MediaPipe landmarks are cached there (.npz) and
+    reused while the video content and profile are unchanged.
+    profile selects the speed/quality trade-off (see EXTRACTION_PROFILES).
+    Pass a StageTimer as timer to see where the time goes (timer.summary()).
+    """
+    if timer is None:
+        timer = StageTimer()
+    frames = list(stream_video(video_path, pose, landmarks_path, profile, timer))
+    with timer.time("postprocess"):
+        return finish_frames(frames, target_fps, keyframe_tolerance)
 
+# --- 4. Batch Mode ---
+
+# Each batch worker process builds its own detectors once (per model
+# complexity), on the first video whose landmarks are not cached, and reuses
+# them for the others
+_worker_detectors = {}
+
+def _get_worker_detectors(profile=None):
+    """Returns (pose, hands); hands is None unless the profile enables it."""
+    settings = get_profile(profile)
+    key = (settings["model_complexity"], bool(settings["hands"]))
+    if key not in _worker_detectors:
+        if not cv2 or mp_pose is None:
+            raise RuntimeError("OpenCV or MediaPipe not functioning correctly.")
+        _worker_detectors[key] = (make_pose(settings), make_hands(settings) if settings["hands"] else None)
+    return _worker_detectors[key]
+
+def extract_to_file(input_path, output_path, target_fps=None, keyframe_tolerance=None, landmarks_path=None,
+                    profile=None):
+    """
+    Extract one video and write its JSON.
+    Returns (frame_count, seconds, stage timings as StageTimer.to_dict()).
+    Landmarks cached at landmarks_path are reused; only retargeting reruns.
+    """
+    start = time.perf_counter()
+    timer = StageTimer()
+    with timer.time("cache"):
+        landmarks = load_landmarks(landmarks_path, input_path, profile) if landmarks_path else None
+    if landmarks is None:
+        pose, hands = _get_worker_detectors(profile)
+        *landmarks, hand_landmarks = extract_tracks(input_path, pose, profile, timer, hands)
+        if landmarks_path:
+            with timer.time("cache"):
+                save_landmarks(landmarks_path, input_path, *landmarks, profile=profile, hands=hand_landmarks)
+    with timer.time("math"):
+        animation_data = retarget(*landmarks, target_fps, keyframe_tolerance)
+    if animation_data:
+        with timer.time("write"):
+            with open(output_path, "w") as f:
+                json.dump(animation_data, f)
+    return len(animation_data), time.perf_counter() - start, timer.to_dict()
+
+def extractor_settings(target_fps=None, keyframe_tolerance=None, profile=None):
+    """Everything besides the video itself that determines an output file."""
+    return {
+        "version": EXTRACTOR_VERSION,
+        "params": {
+            "profile": get_profile(profile),
+            "filter_min_cutoff": FILTER_MIN_CUTOFF,
+            "filter_beta": FILTER_BETA,
+            "target_fps": target_fps,
+            "keyframe_tolerance": keyframe_tolerance,
+        },
+    }
+
+def find_videos(video_dir):
+    videos_found = []
+    for root, dirs, files in os.walk(video_dir):
+        for file in files:
+            if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
+                videos_found.append({
+                    "path": os.path.join(root, file),
+                    "name": file
+                })
+    return videos_found
+
+def run_batch(videos, output_dir, workers=1, target_fps=None, keyframe_tolerance=None, manifest=None,
+              landmarks_dir=None, profile=None, timings_path=None):
+    """
+    Extract every video, serially or on a process pool, printing progress.
+    With a manifest, videos whose output is already up to date are skipped.
+    With landmarks_dir, MediaPipe landmarks are cached there as <word>.npz so
+    later runs only redo the retargeting.
+    With timings_path, per-stage timings are summed over all videos, printed,
+    and written there as JSON along with the per-video breakdown.
+    """
+    profile = get_profile(profile)
+    settings = extractor_settings(target_fps, keyframe_tolerance, profile)
+    jobs = []
+    skipped = 0
+    for video_info in videos:
+        # Use the filename (without extension) as the key
+        # e.g., "my_video.mp4" -> "my_video"
+        base_name = os.path.splitext(video_info['name'])[0].lower().strip()
+        landmarks_path = os.path.join(landmarks_dir, f"{base_name}.npz") if landmarks_dir else None
+        job = (video_info['name'], video_info['path'], os.path.join(output_dir, f"{base_name}.json"), landmarks_path)
+        if manifest is not None and manifest.is_current(job[1], job[2], settings):
+            skipped += 1
+            continue
+        jobs.append(job)
+    if skipped:
+        print(f"Skipping {skipped} up-to-date videos.")
+
+    count = 0
+    total = len(jobs)
+    batch_start = time.perf_counter()
+    timer = StageTimer()
+    per_video = {}
+
+    def report(done, job, result, error):
+        nonlocal count
+        name, input_path, output_path, _ = job
+        prefix = f"[{done}/{total}] {name}"
+        if error is None:
+            timer.merge(result[2])
+            per_video[name] = {"frames": result[0], "seconds": result[1], "stages": result[2]}
+        if error is not None:
+            print(f"❌ {prefix}: error: {error}")
+        elif result[0] == 0:
+            print(f"⚠️ {prefix}: no motion detected ({result[1]:.1f}s)")
+        else:
+            print(f"  {prefix}: {result[0]} frames in {result[1]:.1f}s")
+            count += 1
+            if manifest is not None:
+                manifest.record(input_path, output_path, settings)
+
+    try:
+        if workers <= 1:
+            for done, job in enumerate(jobs, 1):
+                try:
+                    report(done, job, extract_to_file(job[1], job[2], target_fps, keyframe_tolerance, job[3], profile), None)
+                except Exception as e:
+                    report(done, job, None, e)
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(extract_to_file, job[1], job[2], target_fps, keyframe_tolerance, job[3], profile): job
+                    for job in jobs
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    try:
+                        report(done, futures[future], future.result(), None)
+                    except Exception as e:
+                        report(done, futures[future], None, e)
+    finally:
+        # Keep whatever finished even if the run is interrupted
+        if manifest is not None:
+            manifest.save()
+
+    elapsed = time.perf_counter() - batch_start
+    print(f"Batch processing complete. Generated {count} animation files in {elapsed:.1f}s.")
+    if timings_path:
+        # Stage times are summed over workers, so they can exceed the wall time
+        print(timer.summary(f"Stage timings ({len(per_video)} videos, {workers} worker(s))",
+                            frames=timer.stages.get("read", (0, 0))[1]))
+        with open(timings_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "workers": workers,
+                "wall_seconds": elapsed,
+                "profile": profile,
+                "stages": timer.to_dict(),
+                "videos": per_video,
+            }, f, ensure_ascii=False, indent=1)
+        print(f"Timing report written to {timings_path}")
+    return count
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch-extract animations from dataset_videos.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (each owns its own Pose model)")
+    parser.add_argument("--fps", type=float, default=None, help="resample animations to this frame rate")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="drop keyframes reproducible within this error (radians)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-extract every video even if the manifest says it is up to date")
+    parser.add_argument("--no-landmark-cache", action="store_true",
+                        help="do not read or write cached MediaPipe landmarks (dataset_landmarks/*.npz)")
+    parser.add_argument("--profile", choices=sorted(EXTRACTION_PROFILES), default=DEFAULT_PROFILE,
+                        help="speed/quality trade-off for pose extraction")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=None,
+                        help="override the profile's MediaPipe Pose model")
+    parser.add_argument("--downscale", type=float, default=None,
+                        help="override the profile's input downscale factor")
+    parser.add_argument("--stride", type=int, default=None,
+                        help="override the profile's frame stride (run the model on every Nth frame)")
+    parser.add_argument("--max-duration", type=float, default=None,
+                        help="only process the first N seconds of each video")
+    parser.add_argument("--hands", action="store_true",
+                        help="also track hands (saved with the cached landmarks, on the same decoded frames)")
+    parser.add_argument("--timings", nargs="?", const=TIMINGS_NAME, default=None, metavar="REPORT",
+                        help="print per-stage timings and write them as JSON "
+                             f"(default: dataset_animations/{TIMINGS_NAME})")
+    args = parser.parse_args()
+    profile = get_profile(args.profile, model_complexity=args.model_complexity, downscale=args.downscale,
+                          frame_stride=args.stride, max_duration=args.max_duration,
+                          hands=True if args.hands else None)
+
     # Batch processing mode
     video_dir = os.path.join(os.path.dirname(__file__), "dataset_videos")
     output_dir = os.path.join(os.path.dirname(__file__), "dataset_animations")
+    landmarks_dir = None if args.no_landmark_cache else os.path.join(os.path.dirname(__file__), "dataset_landmarks")
     
     if not os.path.exists(video_dir):
         print(f"Creating video directory: {video_dir}")
@@ -287,46 +755,18 @@ if __name__ == "__main__":
         os.makedirs(output_dir)
 
     # Walk through all subdirectories to find videos
-    videos_found = []
     print(f"Scanning {video_dir}...")
-    for root, dirs, files in os.walk(video_dir):
-        for file in files:
-            if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
-                videos_found.append({
-                    "path": os.path.join(root, file),
-                    "name": file
-                })
+    videos_found = find_videos(video_dir)
         
     if not videos_found:
         print(f"❌ No videos found in {video_dir} or its subfolders.")
         print("Please check your folder structure.")
     else:
-        print(f"✅ Found {len(videos_found)} videos. Starting batch extraction...")
+        print(f"✅ Found {len(videos_found)} videos. Starting batch extraction with {args.workers} worker(s)...")
         print("This might take a minute...")
-        
-        count = 0
-        for video_info in videos_found:
-            video_name = video_info['name']
-            input_path = video_info['path']
-            print(f"Processing: {video_name}...")
-            
-            try:
-                animation_data = process_video(input_path)
-                
-                if not animation_data:
-                    print(f"⚠️ Warning: No motion detected in {video_name}")
-                    continue
-
-                # Use the filename (without extension) as the key
-                # e.g., "my_video.mp4" -> "my_video"
-                base_name = os.path.splitext(video_name)[0].lower().strip() 
-                output_path = os.path.join(output_dir, f"{base_name}.json")
-                
-                with open(output_path, "w") as f:
-                    json.dump(animation_data, f)
-                print(f"  -> Saved: {base_name}.json ({len(animation_data)} frames)")
-                count += 1
-            except Exception as e:
-                print(f"❌ Error processing {video_name}: {e}")
-            
-        print(f"Batch processing complete. Generated {count} animation files.")
\ No newline at end of file
+        manifest = ExtractionManifest(os.path.join(output_dir, MANIFEST_NAME))
+        if args.force:
+            manifest.entries = {}
+        timings_path = os.path.join(output_dir, args.timings) if args.timings == TIMINGS_NAME else args.timings
+        run_batch(videos_found, output_dir, args.workers, args.fps, args.tolerance, manifest, landmarks_dir, profile,
+                  timings_path)
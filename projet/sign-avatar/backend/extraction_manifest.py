@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """
+    Records, per output animation, which video content and which extractor
+    settings produced it:
+
+        {"<word>.json": {"video": ..., "sha256": ..., "size": ..., "mtime": ...,
+                         "extractor": {"version": ..., "params": {...}}}}
+
+    A video is skipped when its output exists and both the content hash and the
+    extractor settings match. Size and mtime are checked first so unchanged
+    videos are not re-hashed on every run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Warning: ignoring unreadable manifest {path}")
+                self.entries = {}
+        self._hashes = {}
+
+    def _video_hash(self, video_path, entry):
+        st = os.stat(video_path)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime_ns:
+            return entry["sha256"], st
+        if video_path not in self._hashes:
+            self._hashes[video_path] = file_sha256(video_path)
+        return self._hashes[video_path], st
+
+    def is_current(self, video_path, output_path, extractor):
+        key = os.path.basename(output_path)
+        entry = self.entries.get(key)
+        if not entry or not os.path.exists(output_path):
+            return False
+        sha256, st = self._video_hash(video_path, entry)
+        if entry.get("sha256") != sha256 or entry.get("extractor") != extractor:
+            return False
+        # Same content under a new mtime (e.g. a fresh checkout): remember it
+        entry["size"], entry["mtime"] = st.st_size, st.st_mtime_ns
+        return True
+
+    def record(self, video_path, output_path, extractor):
+        key = os.path.basename(output_path)
+        sha256, st = self._video_hash(video_path, self.entries.get(key))
+        self.entries[key] = {
+            "video": os.path.relpath(video_path, os.path.dirname(self.path)),
+            "sha256": sha256,
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "extractor": extractor,
+        }
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExtractionJob:
+    """One background extraction of a word's animation from its video."""
+
+    def __init__(self, word, video_path):
+        self.id = uuid.uuid4().hex
+        self.word = word
+        self.video_path = video_path
+        self.status = "pending"  # pending -> running -> done | failed
+        self.error = None
+        self.frames = None
+        self.streamed = []  # frames as the extractor yields them, before finishing
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+        self._progress = threading.Condition()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns False if timeout expired first."""
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _publish(self, frame):
+        with self._progress:
+            self.streamed.append(frame)
+            self._progress.notify_all()
+
+    def _finish(self):
+        with self._progress:
+            self._done.set()
+            self._progress.notify_all()
+
+    def stream(self, timeout=None):
+        """
+        Yield the extracted frames as they are produced, from the first one,
+        until the job finishes. Stops early if no new frame arrives within
+        timeout seconds.
+        """
+        sent = 0
+        while True:
+            with self._progress:
+                if sent >= len(self.streamed) and not self.done:
+                    self._progress.wait(timeout)
+                pending = self.streamed[sent:]
+                finished = self.done
+            if not pending and not finished:
+                return  # timed out
+            yield from pending
+            sent += len(pending)
+            if finished and sent >= len(self.streamed):
+                return
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "word": self.word,
+            "status": self.status,
+            "error": self.error,
+            "frames": len(self.frames) if self.frames is not None else None,
+            "streamed": len(self.streamed),
+        }
+
+
+class ExtractionQueue:
+    """
+    Runs the extractor in a thread pool and writes dataset_animations/<word>.json.
+
+    extract(video_path) returns or yields the frames; yielded frames are
+    published on the job as they come (see ExtractionJob.stream). finish, if
+    given, turns the collected frames into the animation that is saved.
+
+    Concurrent submissions for the same word are collapsed onto the job already
+    in flight (single-flight), so a word is only ever extracted once at a time.
+    Finished jobs are kept (up to keep_finished) so clients can poll them by id.
+    """
+
+    def __init__(self, extract, animations_dir, max_workers=2, keep_finished=256, finish=None):
+        self.extract = extract
+        self.finish = finish
+        self.animations_dir = animations_dir
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extract")
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._jobs = OrderedDict()
+
+    def submit(self, word, video_path):
+        with self._lock:
+            job = self._in_flight.get(word)
+            if job is not None:
+                return job
+            job = ExtractionJob(word, video_path)
+            self._in_flight[word] = job
+            self._jobs[job.id] = job
+            self._executor.submit(self._run, job)
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        try:
+            for frame in self.extract(job.video_path):
+                job._publish(frame)
+            frames = self.finish(job.streamed) if self.finish else list(job.streamed)
+            self._save(job.word, frames)
+            job.frames = frames
+            job.status = "done"
+        except Exception as e:
+            print(f"Error extracting motion for '{job.word}': {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._in_flight.pop(job.word, None)
+                self._trim_finished()
+            job._finish()
+
+    def _save(self, word, frames):
+        os.makedirs(self.animations_dir, exist_ok=True)
+        json_path = os.path.join(self.animations_dir, f"{word}.json")
+        # Write then rename so readers never see a half-written file
+        tmp_path = f"{json_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(frames, f)
+        os.replace(tmp_path, json_path)
+        print(f"Saved generated animation to {json_path}")
+
+    def _trim_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
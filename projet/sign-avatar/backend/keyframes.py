@@ -0,0 +1,82 @@
+"""
+Optional post-processing for extracted animations: fps resampling and
+keyframe reduction.
+
+Reduced frames carry their timestamp in seconds under the reserved "t" key,
+e.g. {"t": 0.4, "RightArm": {"x": .., "y": .., "z": ..}, ...}, so players
+interpolate between keyframes instead of stepping one frame per tick.
+"""
+import numpy as np
+
+from animation_format import TIME_KEY, frames_to_array, to_frames
+
+DEFAULT_FPS = 30.0
+
+
+def _split(frames, fps):
+    """Return (bone_names, values, times) for a frame list."""
+    bones, values = frames_to_array(frames)
+    if frames and all(TIME_KEY in frame for frame in frames):
+        times = np.array([frame[TIME_KEY] for frame in frames], dtype=np.float64)
+    else:
+        times = np.arange(len(frames), dtype=np.float64) / (fps or DEFAULT_FPS)
+    return bones, values.astype(np.float64), times
+
+
+def _resample(values, times, target_fps):
+    if len(times) < 2:
+        return values, times
+    new_times = np.arange(times[0], times[-1] + 1e-9, 1.0 / target_fps)
+    flat = values.reshape(len(times), -1)
+    out = np.empty((len(new_times), flat.shape[1]))
+    for c in range(flat.shape[1]):
+        out[:, c] = np.interp(new_times, times, flat[:, c])
+    return out.reshape((len(new_times),) + values.shape[1:]), new_times
+
+
+def _keyframe_indices(values, times, tolerance):
+    """
+    Ramer-Douglas-Peucker over the whole pose curve. A frame is dropped only
+    if linear interpolation between the kept neighbours reproduces every
+    bone/axis channel within tolerance (radians).
+    """
+    n = len(times)
+    if n <= 2:
+        return list(range(n))
+    flat = values.reshape(n, -1)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        span = times[end] - times[start]
+        w = ((times[start + 1:end] - times[start]) / span)[:, None] if span > 0 else 0.0
+        predicted = flat[start] + w * (flat[end] - flat[start])
+        error = np.abs(flat[start + 1:end] - predicted).max(axis=1)
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            mid = start + 1 + worst
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return np.flatnonzero(keep)
+
+
+def postprocess(frames, fps=None, target_fps=None, tolerance=None):
+    """
+    Resample frames to target_fps and/or drop redundant keyframes.
+
+    fps is the rate of the input frames when they carry no "t" timestamps.
+    With neither target_fps nor tolerance set the frames are returned as is.
+    """
+    if not frames or (not target_fps and tolerance is None):
+        return frames
+    bones, values, times = _split(frames, fps)
+    if target_fps:
+        values, times = _resample(values, times, target_fps)
+    if tolerance is not None:
+        keep = _keyframe_indices(values, times, tolerance)
+        values, times = values[keep], times[keep]
+    return to_frames(bones, values, times)
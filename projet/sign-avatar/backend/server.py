@@ -1,110 +1,171 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, url_for
 from flask_cors import CORS
 import json
+import math
 import random
 import os
 import glob
+import mimetypes
+import functools
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 # Initialize Flask App
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
 import torch
-import torch.nn as nn
-
-# Define the Model Architecture based on the .pth file inspection
-class SignLangCNN(nn.Module):
-    def __init__(self):
-        super(SignLangCNN, self).__init__()
-        self.cnn = nn.Sequential(
-            nn.Conv2d(3, 16, kernel_size=3), # Index 0
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Conv2d(16, 32, kernel_size=3), # Index 3
-            nn.ReLU(),
-            nn.MaxPool2d(2)
-        )
-        self.lstm = nn.LSTM(input_size=8192, hidden_size=128, batch_first=True)
-        self.fc = nn.Linear(128, 8) 
-
-    def forward(self, x):
-        batch_size, time_steps, C, H, W = x.size()
-        c_in = x.view(batch_size * time_steps, C, H, W)
-        c_out = self.cnn(c_in)
-        r_in = c_out.view(batch_size, time_steps, -1)
-        r_out, _ = self.lstm(r_in)
-        out = self.fc(r_out[:, -1, :])
-        return out
+
+from sign_model import INPUT_SIZE, load_model, quantize_model
+from sign_inference import BatchingPredictor, StreamingSessions, decode_clip, parity_report
 
 # Initialize and Load Model
+MODEL_PATH = "backend/signlang_cnnlstm.pth"
 try:
-    model = SignLangCNN()
-    # Load weights (map_location='cpu' ensures it works even if trained on GPU)
-    model.load_state_dict(torch.load("backend/signlang_cnnlstm.pth", map_location=torch.device('cpu')))
-    model.eval()
+    model = load_model(MODEL_PATH)
     print("SUCCESS: Model loaded successfully!")
 except Exception as e:
     print(f"WARNING: Could not load model. Error: {e}")
     model = None
 
+# SIGN_QUANTIZE=1 serves a dynamic int8 copy (LSTM + Linear), SIGN_TRACE=1 also
+# freezes its CNN with TorchScript; see benchmark_sign_model.py for the trade-off.
+if model is not None and os.environ.get("SIGN_QUANTIZE", "0") == "1":
+    quantized = quantize_model(model, trace=os.environ.get("SIGN_TRACE", "0") == "1")
+    parity = parity_report(model, quantized, [torch.rand(16, 3, INPUT_SIZE, INPUT_SIZE) for _ in range(8)])
+    print(f"Serving int8 model (parity on random clips: {parity})")
+    model = quantized
+
+# /recognize requests arriving together are classified in one forward pass:
+# up to SIGN_MAX_BATCH clips, waiting at most SIGN_MAX_LATENCY_MS for company.
+sign_predictor = BatchingPredictor(
+    model,
+    max_batch_size=int(os.environ.get("SIGN_MAX_BATCH", "16")),
+    max_latency=float(os.environ.get("SIGN_MAX_LATENCY_MS", "10")) / 1000,
+) if model is not None else None
+RECOGNIZE_TIMEOUT = 30
+# Longer clips are rejected so one request cannot hold up the shared batch
+SIGN_MAX_CLIP_FRAMES = int(os.environ.get("SIGN_MAX_CLIP_FRAMES", "300"))
+
+# Live (webcam) recognition keeps LSTM state per client between requests
+sign_sessions = StreamingSessions(
+    model, ttl=float(os.environ.get("SIGN_SESSION_TTL", "60"))
+) if model is not None else None
+
 # Import our Motion Extractor
-from extract_motion import process_video
+from extract_motion import stream_video, finish_frames, get_profile
+from animation_cache import AnimationCache
+import animation_format
+from keyframes import DEFAULT_FPS, TIME_KEY
+from video_index import VideoIndex
+from extraction_queue import ExtractionJob, ExtractionQueue
+
+VIDEOS_DIR = os.path.join(os.path.dirname(__file__), "dataset_videos")
+video_index = VideoIndex(VIDEOS_DIR)
+VIDEO_MAX_AGE = 3600
+
+# Let a fronting nginx/Apache stream files itself (X-Sendfile) when enabled
+app.use_x_sendfile = os.environ.get("USE_X_SENDFILE", "0") == "1"
+print(f"Indexed {len(video_index)} videos from {VIDEOS_DIR}")
 
-def run_model_inference(word):
+ANIMATIONS_DIR = os.path.join(os.path.dirname(__file__), "dataset_animations")
+animation_cache = AnimationCache(ANIMATIONS_DIR)
+
+# Missing animations are extracted in the background; /predict waits at most
+# PREDICT_WAIT_SECONDS (overridable per request with "wait") before answering 202.
+# Optional keyframe post-processing for generated animations (see keyframes.py)
+ANIMATION_TARGET_FPS = float(os.environ["ANIMATION_TARGET_FPS"]) if os.environ.get("ANIMATION_TARGET_FPS") else None
+KEYFRAME_TOLERANCE = float(os.environ["KEYFRAME_TOLERANCE"]) if os.environ.get("KEYFRAME_TOLERANCE") else None
+# Speed/quality trade-off for on-demand extraction (see EXTRACTION_PROFILES)
+EXTRACTION_PROFILE = get_profile(os.environ.get("EXTRACTION_PROFILE") or None)
+
+extraction_queue = ExtractionQueue(
+    functools.partial(stream_video, profile=EXTRACTION_PROFILE),
+    ANIMATIONS_DIR,
+    max_workers=int(os.environ.get("EXTRACTION_WORKERS", "2")),
+    finish=functools.partial(finish_frames, target_fps=ANIMATION_TARGET_FPS, keyframe_tolerance=KEYFRAME_TOLERANCE),
+)
+PREDICT_WAIT_SECONDS = float(os.environ.get("PREDICT_WAIT_SECONDS", "10"))
+# Upper bound for a client-supplied "wait", so a request cannot hold a worker indefinitely
+PREDICT_MAX_WAIT_SECONDS = float(os.environ.get("PREDICT_MAX_WAIT_SECONDS", "30"))
+# /predict_stream gives up if the extractor produces no frame for this long
+STREAM_IDLE_SECONDS = float(os.environ.get("STREAM_IDLE_SECONDS", "30"))
+
+
+def encode_animation(key, animation_data, fmt="json"):
     """
-    Looks for a pre-recorded JSON animation file for the given word.
-    If not found, attempts to generate it from a video file.
+    Returns (bytes, mimetype) for the word's animation, either as JSON or as
+    compact SANM binary. Files already on disk are sent from the cache without
+    parsing or re-serializing them.
     """
-    print(f"Requesting sign for: {word}")
-    
-    # 1. Normalize word
-    key = word.lower().strip()
-    
-    # 2. Check for JSON file in dataset_animations
-    animations_dir = os.path.join(os.path.dirname(__file__), "dataset_animations")
-    json_path = os.path.join(animations_dir, f"{key}.json")
-    
-    if os.path.exists(json_path):
-        print(f"Found animation file: {json_path}")
+    if animation_data:
         try:
-            with open(json_path, "r") as f:
-                return json.load(f)
+            entry = animation_cache.get(key)
+            if entry is not None:
+                if fmt == "sanm":
+                    return entry.binary, animation_format.CONTENT_TYPE
+                return entry.payload, 'application/json'
         except Exception as e:
             print(f"Error loading JSON: {e}")
+    if fmt == "sanm":
+        return animation_format.encode(animation_data), animation_format.CONTENT_TYPE
+    return json.dumps(animation_data).encode("utf-8"), 'application/json'
 
-    # 3. If JSON not found, looks for corresponding VIDEO
-    print(f"JSON not found. Searching for video for '{key}'...")
-    video_root = os.path.join(os.path.dirname(__file__), "dataset_videos")
-    
-    video_path = None
-    for root, dirs, files in os.walk(video_root):
-        for file in files:
-            if os.path.splitext(file.lower())[0] == key and file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                 video_path = os.path.join(root, file)
-                 break
-        if video_path: break
+def get_cached_animation(key):
+    try:
+        return animation_cache.get(key)
+    except Exception as e:
+        print(f"Error loading JSON: {e}")
+        return None
+
+def find_animation(word):
+    """
+    Returns (key, entry, video_path): the animation key for word, its cached
+    animation (None if not stored yet) and the video to extract it from.
+    A word that only matches a video after case/accent folding takes the
+    video's name as key, so "Bacteries" reuses bactéries.json instead of
+    extracting a second copy.
+    """
+    key = word.lower().strip()
+    entry = get_cached_animation(key)
+    if entry is not None:
+        return key, entry, None
+    video_path, video_key = video_index.resolve(key)
+    if video_path is None:
+        return key, None, None
+    if video_key != key:
+        key = video_key
+        entry = get_cached_animation(key)
+    return key, entry, video_path
+
+def run_model_inference(word, timeout=None):
+    """
+    Looks for a pre-recorded JSON animation file for the given word.
+    If not found, attempts to generate it from a video file.
+    Returns (key, result): the animation key and the frames, [] if nothing is
+    available, or the pending ExtractionJob if the extraction did not finish
+    within timeout seconds.
+    """
+    print(f"Requesting sign for: {word}")
     
+    # 1. Check for JSON file in dataset_animations (served from the shared cache)
+    key, entry, video_path = find_animation(word)
+    if entry is not None:
+        return key, entry.data
+
+    # 2. If JSON not found, extract it from the corresponding VIDEO
     if video_path:
         print(f"Found video: {video_path}. Extracting motion...")
-        try:
-            # Run extraction (this might take a few seconds)
-            animation_data = process_video(video_path)
-            
-            # Save it for next time
-            if not os.path.exists(animations_dir):
-                os.makedirs(animations_dir)
-                
-            with open(json_path, "w") as f:
-                json.dump(animation_data, f)
-            print(f"Saved generated animation to {json_path}")
-            
-            return animation_data
-        except Exception as e:
-            print(f"Error extracting motion: {e}")
+        # Runs in the background queue; concurrent requests share one job.
+        # The queue saves the JSON for next time.
+        job = extraction_queue.submit(key, video_path)
+        if not job.wait(timeout):
+            return key, job
+        if job.status == "done":
+            return key, job.frames
 
-    # 4. Last absolute fallback
+    # 3. Last absolute fallback
     print(f"❌ Word '{word}' not found in animations or videos.")
-    return [] 
+    return key, []
 
 
 
@@ -116,23 +177,174 @@ def predict():
     if not word:
         return jsonify({"error": "No word provided"}), 400
 
-    # Get animation frames from your model
-    animation_data = run_model_inference(word)
+    # "format": "sanm" (or ?format=sanm) returns the compact binary form
+    fmt = data.get('format') or request.args.get('format', 'json')
+    if fmt not in ('json', 'sanm'):
+        return jsonify({"error": "Unknown format"}), 400
+
+    # Missing animations are extracted in the background: wait up to "wait"
+    # seconds, then hand back a job id to poll via /jobs/<job_id>.
+    try:
+        timeout = float(data.get('wait', PREDICT_WAIT_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid wait"}), 400
+    if not math.isfinite(timeout):
+        return jsonify({"error": "Invalid wait"}), 400
+    timeout = max(0.0, min(timeout, PREDICT_MAX_WAIT_SECONDS))
+
+    # Get animation frames from your model; cached files are sent as stored bytes
+    key, animation_data = run_model_inference(word, timeout=timeout)
+    if isinstance(animation_data, ExtractionJob):
+        body = animation_data.to_dict()
+        body["poll"] = url_for('job_status', job_id=animation_data.id)
+        return jsonify(body), 202
+
+    payload, mimetype = encode_animation(key, animation_data, fmt)
     
-    return jsonify(animation_data)
+    return Response(payload, mimetype=mimetype)
+
+@app.route('/predict_stream', methods=['POST'])
+def predict_stream():
+    """
+    Same lookup as /predict, answered as NDJSON (one frame per line) so the
+    client can start playing while a missing animation is still being
+    extracted. Streamed frames carry their "t" timestamp in seconds; the
+    stored animation is written by the extraction queue once it is done.
+    """
+    data = request.json or {}
+    word = data.get('word', '')
+    if not word:
+        return jsonify({"error": "No word provided"}), 400
+
+    job = None
+    key, entry, video_path = find_animation(word)
+    if entry is not None:
+        # Stored animations without post-processing are plain per-frame lists
+        frames = [
+            frame if TIME_KEY in frame else dict(frame, **{TIME_KEY: i / DEFAULT_FPS})
+            for i, frame in enumerate(entry.data)
+        ]
+    else:
+        if not video_path:
+            return jsonify({"error": "Word not found"}), 404
+        job = extraction_queue.submit(key, video_path)
+        frames = job.stream(timeout=STREAM_IDLE_SECONDS)
+
+    def generate():
+        for frame in frames:
+            yield json.dumps(frame) + "\n"
+        if job is not None and job.status == "failed":
+            yield json.dumps({"error": job.error}) + "\n"
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+@app.route('/recognize', methods=['POST'])
+def recognize():
+    """Classify a clip ("frames" or base64 "images", see decode_clip) with SignLangCNN."""
+    if sign_predictor is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    try:
+        clip = decode_clip(request.json or {}, max_frames=SIGN_MAX_CLIP_FRAMES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    future = sign_predictor.submit(clip)
+    try:
+        probabilities = future.result(timeout=RECOGNIZE_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        return jsonify({"error": "Recognition timed out"}), 503
+    confidence, label = probabilities.max(dim=0)
+    return jsonify({
+        "class": int(label),
+        "confidence": float(confidence),
+        "probabilities": probabilities.tolist(),
+    })
+
+@app.route('/recognize/sessions', methods=['POST'])
+def create_recognize_session():
+    """
+    Start a live recognition session. Optional "window": classify only the
+    last N frames (sliding window) instead of everything since the start.
+    """
+    if sign_sessions is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    window = (request.json or {}).get('window') if request.is_json else None
+    if window is not None and (isinstance(window, bool) or not isinstance(window, int) or window < 1):
+        return jsonify({"error": "Invalid window"}), 400
+    session_id, _ = sign_sessions.create(window)
+    return jsonify({"session_id": session_id, "window": window}), 201
+
+@app.route('/recognize/sessions/<session_id>/frames', methods=['POST'])
+def push_recognize_frames(session_id):
+    """Add the newest frame(s) to a session; each costs one CNN pass and one LSTM step."""
+    if sign_sessions is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    session = sign_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Session not found"}), 404
+    data = request.json or {}
+    try:
+        frames = decode_clip(data, max_frames=SIGN_MAX_CLIP_FRAMES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if data.get('reset'):
+        session.reset()
+
+    probabilities = session.push(frames)
+    confidence, label = probabilities.max(dim=0)
+    return jsonify({
+        "class": int(label),
+        "confidence": float(confidence),
+        "probabilities": probabilities.tolist(),
+        "frames": session.frames,
+    })
+
+@app.route('/recognize/sessions/<session_id>', methods=['DELETE'])
+def close_recognize_session(session_id):
+    if sign_sessions is None or not sign_sessions.close(session_id):
+        return jsonify({"error": "Session not found"}), 404
+    return '', 204
+
+@app.route('/recognize/stats', methods=['GET'])
+def recognize_stats():
+    if sign_predictor is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    stats = sign_predictor.stats()
+    stats["live_sessions"] = len(sign_sessions)
+    return jsonify(stats)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = extraction_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/get_video/<word>', methods=['GET'])
 def get_video(word):
-    video_root = os.path.join(os.path.dirname(__file__), 'dataset_videos')
-    # Normalized search
-    target = word.lower().strip()
-    for root, dirs, files in os.walk(video_root):
-        for file in files:
-            # Check if filename starts with the word (e.g. "bras.mp4" matches "bras")
-            if file.lower().startswith(target) and file.endswith('.mp4'):
-                response = send_file(os.path.join(root, file), mimetype='video/mp4')
-                response.headers.add('Access-Control-Allow-Origin', '*')
-                return response
+    # Case/accent-insensitive lookup in the prebuilt index
+    video_path = video_index.lookup(word)
+    if video_path:
+        mimetype = mimetypes.guess_type(video_path)[0] or 'video/mp4'
+        # conditional=True answers Range requests with 206 Partial Content and
+        # If-None-Match / If-Modified-Since with 304. Full responses go through
+        # wsgi.file_wrapper (sendfile under gunicorn) or X-Sendfile if enabled.
+        response = send_file(
+            video_path,
+            mimetype=mimetype,
+            conditional=True,
+            etag=True,
+            last_modified=os.path.getmtime(video_path),
+            max_age=VIDEO_MAX_AGE,
+        )
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers['Access-Control-Expose-Headers'] = 'Accept-Ranges, Content-Range, Content-Length, ETag'
+        return response
     return jsonify({"error": "Video not found"}), 404
 
 if __name__ == '__main__':
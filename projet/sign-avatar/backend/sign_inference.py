@@ -0,0 +1,284 @@
+import base64
+import io
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_sequence
+
+from sign_model import INPUT_SIZE
+
+
+def decode_clip(data, max_frames=None):
+    """
+    Build a (time, 3, INPUT_SIZE, INPUT_SIZE) float tensor from a request body:
+    either "frames", a nested list in that shape with values in [0, 1], or
+    "images", a list of base64 (or data: URL) encoded RGB images that are
+    resized and scaled to [0, 1]. Raises ValueError on bad input, including
+    clips longer than max_frames.
+    """
+    for field in ("images", "frames"):
+        if max_frames and isinstance(data.get(field), list) and len(data[field]) > max_frames:
+            raise ValueError(f"Too many frames (at most {max_frames})")
+    if data.get("images"):
+        from PIL import Image
+
+        frames = []
+        for encoded in data["images"]:
+            if not isinstance(encoded, str):
+                raise ValueError("images must be base64 strings")
+            if encoded.startswith("data:"):
+                encoded = encoded.split(",", 1)[-1]
+            try:
+                image = Image.open(io.BytesIO(base64.b64decode(encoded))).convert("RGB")
+            except Exception as e:
+                raise ValueError(f"Invalid image: {e}")
+            image = image.resize((INPUT_SIZE, INPUT_SIZE))
+            frames.append(np.asarray(image, dtype=np.float32).transpose(2, 0, 1) / 255.0)
+        clip = torch.from_numpy(np.stack(frames))
+    elif data.get("frames"):
+        try:
+            clip = torch.tensor(data["frames"], dtype=torch.float32)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid frames: {e}")
+    else:
+        raise ValueError("No frames or images provided")
+    if clip.dim() == 3:
+        clip = clip.unsqueeze(0)  # a single frame
+    if clip.dim() != 4 or tuple(clip.shape[1:]) != (3, INPUT_SIZE, INPUT_SIZE):
+        raise ValueError(f"Expected frames of shape (3, {INPUT_SIZE}, {INPUT_SIZE}), got {tuple(clip.shape[1:])}")
+    return clip
+
+
+def batched_forward(model, clips):
+    """
+    SignLangCNN logits for clips of different lengths in one forward pass.
+
+    Every frame of every clip goes through the CNN together; the per-clip
+    feature sequences are padded and packed so the LSTM stops at each clip's
+    last real frame, which gives the same result as running model(clip)
+    once per clip.
+    """
+    lengths = [len(clip) for clip in clips]
+    features = model.cnn(torch.cat(clips)).flatten(1)
+    padded = pad_sequence(torch.split(features, lengths), batch_first=True)
+    packed = pack_padded_sequence(padded, lengths, batch_first=True, enforce_sorted=False)
+    _, (h_n, _) = model.lstm(packed)
+    return model.fc(h_n[-1])
+
+
+def parity_report(reference, candidate, clips):
+    """
+    Compare two models' predictions on the same clips: top-1 agreement and
+    the largest/mean absolute difference in class probabilities.
+    """
+    with torch.inference_mode():
+        expected = torch.softmax(batched_forward(reference, clips), dim=1)
+        actual = torch.softmax(batched_forward(candidate, clips), dim=1)
+    diff = (expected - actual).abs()
+    return {
+        "clips": len(clips),
+        "top1_agreement": float((expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean()),
+        "max_prob_diff": float(diff.max()),
+        "mean_prob_diff": float(diff.mean()),
+    }
+
+
+class BatchingPredictor:
+    """
+    Groups concurrent predictions into micro-batches for one forward pass.
+
+    A batch is closed when it reaches max_batch_size clips or when its oldest
+    request has waited max_latency seconds, whichever comes first.
+    submit() returns a Future resolving to the clip's class probabilities.
+    """
+
+    def __init__(self, model, max_batch_size=16, max_latency=0.01):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._requests = 0
+        self._batches = 0
+        self._batch_sizes = Counter()
+        self._frames = 0
+        self._busy = 0.0
+        self._wait_total = 0.0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._thread = threading.Thread(target=self._loop, name="sign-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, clip):
+        future = Future()
+        self._queue.put((clip, future, time.perf_counter()))
+        return future
+
+    def predict(self, clip, timeout=None):
+        return self.submit(clip).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = item[2] + self.max_latency
+            stop = False
+            while len(batch) < self.max_batch_size:
+                # Past the deadline, still take whatever is already queued
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch):
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            with torch.inference_mode():
+                probabilities = torch.softmax(batched_forward(self.model, [clip for clip, _, _ in batch]), dim=1)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        end = time.perf_counter()
+        for (_, future, _), probs in zip(batch, probabilities):
+            future.set_result(probs)
+
+        with self._lock:
+            self._requests += len(batch)
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+            self._frames += sum(len(clip) for clip, _, _ in batch)
+            self._busy += end - start
+            for _, _, submitted in batch:
+                self._wait_total += start - submitted
+                self._latency_total += end - submitted
+                self._latency_max = max(self._latency_max, end - submitted)
+
+    def stats(self):
+        with self._lock:
+            uptime = time.monotonic() - self._started_at
+            requests = self._requests
+            return {
+                "requests": requests,
+                "batches": self._batches,
+                "mean_batch_size": requests / self._batches if self._batches else 0.0,
+                "batch_sizes": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "frames": self._frames,
+                "queued": self._queue.qsize(),
+                "busy_seconds": self._busy,
+                "clips_per_busy_second": requests / self._busy if self._busy else 0.0,
+                "clips_per_second": requests / uptime if uptime else 0.0,
+                "mean_queue_ms": self._wait_total / requests * 1000 if requests else 0.0,
+                "mean_latency_ms": self._latency_total / requests * 1000 if requests else 0.0,
+                "max_latency_ms": self._latency_max * 1000,
+                "max_batch_size": self.max_batch_size,
+                "max_latency_ms_budget": self.max_latency * 1000,
+            }
+
+
+class StreamingSession:
+    """
+    Incremental SignLangCNN inference for one live client (e.g. a webcam).
+
+    Each pushed frame goes through the CNN once. Without a window the LSTM
+    state is carried over, so a frame costs one CNN pass plus one LSTM step
+    and the prediction covers everything since the session started (or the
+    last reset). With window=N the last N frames' CNN features are kept and
+    the LSTM re-runs over just those, matching model() on a sliding window
+    without recomputing any CNN features.
+    """
+
+    def __init__(self, model, window=None):
+        self.model = model
+        self.window = window
+        self.frames = 0
+        self.last_used = time.monotonic()
+        self._state = None
+        self._features = deque(maxlen=window) if window else None
+        self._lock = threading.Lock()
+
+    def push(self, frames):
+        """Feed a (n, 3, H, W) tensor of new frames; returns class probabilities."""
+        with self._lock, torch.inference_mode():
+            features = self.model.cnn(frames).flatten(1)
+            if self._features is None:
+                out, self._state = self.model.lstm(features.unsqueeze(0), self._state)
+            else:
+                self._features.extend(features)
+                out, _ = self.model.lstm(torch.stack(tuple(self._features)).unsqueeze(0))
+            self.frames += len(frames)
+            self.last_used = time.monotonic()
+            return torch.softmax(self.model.fc(out[:, -1]), dim=1)[0]
+
+    def reset(self):
+        with self._lock:
+            self._state = None
+            if self._features is not None:
+                self._features.clear()
+            self.frames = 0
+
+
+class StreamingSessions:
+    """Per-client StreamingSession registry; sessions idle for ttl seconds are dropped."""
+
+    def __init__(self, model, ttl=60.0, max_sessions=256):
+        self.model = model
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, window=None):
+        session = StreamingSession(self.model, window)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)  # least recently used
+            self._sessions[session_id] = session
+        return session_id, session
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [sid for sid, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[session_id]
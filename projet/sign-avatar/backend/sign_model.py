@@ -0,0 +1,58 @@
+import copy
+
+import torch
+import torch.nn as nn
+
+# Frame size the CNN expects: two (conv3 + pool2) stages turn 70x70 into the
+# 32 x 16 x 16 = 8192 features the LSTM was trained on.
+INPUT_SIZE = 70
+NUM_CLASSES = 8
+
+
+# Define the Model Architecture based on the .pth file inspection
+class SignLangCNN(nn.Module):
+    def __init__(self):
+        super(SignLangCNN, self).__init__()
+        self.cnn = nn.Sequential(
+            nn.Conv2d(3, 16, kernel_size=3), # Index 0
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Conv2d(16, 32, kernel_size=3), # Index 3
+            nn.ReLU(),
+            nn.MaxPool2d(2)
+        )
+        self.lstm = nn.LSTM(input_size=8192, hidden_size=128, batch_first=True)
+        self.fc = nn.Linear(128, NUM_CLASSES)
+
+    def forward(self, x):
+        batch_size, time_steps, C, H, W = x.size()
+        c_in = x.view(batch_size * time_steps, C, H, W)
+        c_out = self.cnn(c_in)
+        r_in = c_out.view(batch_size, time_steps, -1)
+        r_out, _ = self.lstm(r_in)
+        out = self.fc(r_out[:, -1, :])
+        return out
+
+
+def load_model(path):
+    model = SignLangCNN()
+    # Load weights (map_location='cpu' ensures it works even if trained on GPU)
+    model.load_state_dict(torch.load(path, map_location=torch.device('cpu')))
+    model.eval()
+    return model
+
+
+def quantize_model(model, trace=False):
+    """
+    Dynamic int8 copy of model for CPU serving: the LSTM and Linear weights
+    are stored as int8 and their activations quantized on the fly, the CNN
+    stays fp32. trace=True also freezes the CNN into a TorchScript graph.
+    The original model is left untouched.
+    """
+    qmodel = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+    qmodel.eval()
+    if trace:
+        example = torch.rand(1, 3, INPUT_SIZE, INPUT_SIZE)
+        with torch.no_grad():
+            qmodel.cnn = torch.jit.freeze(torch.jit.trace(qmodel.cnn, example))
+    return qmodel
@@ -0,0 +1,58 @@
+import contextlib
+import time
+from collections import OrderedDict
+
+
+class StageTimer:
+    """
+    Cumulative wall time and call count per named pipeline stage, e.g.
+    read / convert / pose / math for motion extraction.
+
+    Timers from several videos (or worker processes, via to_dict) can be
+    merged into one.
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()  # stage -> [seconds, calls]
+
+    def add(self, stage, seconds, calls=1):
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def merge(self, other):
+        stages = other.stages.items() if isinstance(other, StageTimer) else (
+            (stage, (row["seconds"], row["calls"])) for stage, row in other.items()
+        )
+        for stage, (seconds, calls) in stages:
+            self.add(stage, seconds, calls)
+        return self
+
+    @property
+    def total(self):
+        return sum(seconds for seconds, _ in self.stages.values())
+
+    def to_dict(self):
+        return {
+            stage: {"seconds": seconds, "calls": calls}
+            for stage, (seconds, calls) in self.stages.items()
+        }
+
+    def summary(self, title="Stage timings", frames=None):
+        """Table of the stages; with frames, also the total cost per frame."""
+        total = self.total or 1.0
+        lines = [f"{title}:", f"  {'stage':<12} {'total s':>9} {'calls':>8} {'ms/call':>9} {'share':>6}"]
+        for stage, (seconds, calls) in self.stages.items():
+            per_call = seconds / calls * 1000 if calls else 0.0
+            lines.append(f"  {stage:<12} {seconds:9.2f} {calls:8d} {per_call:9.3f} {seconds / total:6.1%}")
+        if frames:
+            lines.append(f"  {frames} frames, {self.total / frames * 1000:.2f} ms per frame")
+        return "\n".join(lines)
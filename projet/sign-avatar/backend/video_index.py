@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+import unicodedata
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def normalize_word(word, fold_accents=False):
+    """Lowercase, NFC-normalize and collapse whitespace; optionally strip accents."""
+    text = unicodedata.normalize("NFC", word).lower().strip()
+    text = " ".join(text.split())
+    if fold_accents:
+        text = "".join(
+            ch for ch in unicodedata.normalize("NFKD", text)
+            if not unicodedata.combining(ch)
+        )
+    return text
+
+
+class VideoIndex:
+    """
+    Maps normalized word -> video path for every file under dataset_videos.
+
+    The tree is walked once up front. Lookups re-check directory mtimes at
+    most every refresh_interval seconds and rebuild the index only when a
+    folder was added, removed or had files added/removed.
+    """
+
+    def __init__(self, root, extensions=VIDEO_EXTENSIONS, refresh_interval=2.0):
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._folded = {}
+        self._dir_mtimes = {}
+        self._checked_at = 0.0
+        self.rebuild()
+
+    def _scan_dir_mtimes(self):
+        mtimes = {}
+        for root, dirs, _files in os.walk(self.root):
+            try:
+                mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def rebuild(self):
+        exact, folded = {}, {}
+        rank = {ext: i for i, ext in enumerate(self.extensions)}
+        for root, dirs, files in os.walk(self.root):
+            dirs.sort()
+            for file in sorted(files):
+                stem, ext = os.path.splitext(file)
+                ext = ext.lower()
+                if ext not in rank:
+                    continue
+                path = os.path.join(root, file)
+                for index, key in ((exact, normalize_word(stem)), (folded, normalize_word(stem, True))):
+                    current = index.get(key)
+                    # First folder in sorted order wins; within it prefer .mp4 etc.
+                    if current is None or (
+                        os.path.dirname(current) == root
+                        and rank[ext] < rank[os.path.splitext(current)[1].lower()]
+                    ):
+                        index[key] = path
+        mtimes = self._scan_dir_mtimes()
+        with self._lock:
+            self._exact, self._folded = exact, folded
+            self._dir_mtimes = mtimes
+            self._checked_at = time.monotonic()
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+            known = self._dir_mtimes
+        # Adding a file or folder bumps its parent's mtime, so stat'ing the
+        # directories we already know about is enough to detect changes.
+        for path, mtime in known.items():
+            try:
+                changed = os.stat(path).st_mtime_ns != mtime
+            except OSError:
+                changed = True
+            if changed:
+                self.rebuild()
+                return
+
+    def lookup(self, word):
+        """Return the video path for word (case/accent-insensitive), or None."""
+        return self.resolve(word)[0]
+
+    def resolve(self, word):
+        """
+        Return (video path, canonical word) for word, or (None, None). The
+        canonical word is the matched file's lowercased stem, the name its
+        animation is stored under (e.g. "Bacteries" -> "bactéries").
+        """
+        if not word:
+            return None, None
+        self._refresh_if_changed()
+        with self._lock:
+            path = self._exact.get(normalize_word(word))
+            if path is None:
+                path = self._folded.get(normalize_word(word, True))
+        if path is None:
+            return None, None
+        return path, os.path.splitext(os.path.basename(path))[0].lower().strip()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._exact)
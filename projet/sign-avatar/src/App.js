@@ -2,8 +2,50 @@ import React, { useState, Suspense, useRef } from "react";
 import { Canvas } from "@react-three/fiber";
 import { OrbitControls, Html } from "@react-three/drei";
 import Avatar from "./Avatar";
+import { decodeSanm, poseAt } from "./sanm";
 import "./App.css";
 
+const API_URL = "http://localhost:5000";
+
+// Cached animations come back from /predict as SANM. Words without one are
+// extracted on the server: /predict answers 202 and we read /predict_stream
+// instead, which sends frames (NDJSON) as soon as they are computed.
+async function fetchAnimation(word) {
+  const response = await fetch(`${API_URL}/predict`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ word, format: "sanm", wait: 0 }),
+  });
+  if (response.status === 202) return null;
+  return decodeSanm(await response.arrayBuffer());
+}
+
+// Appends streamed frames to `frames` as they arrive; resolves at the end.
+async function streamAnimation(word, frames) {
+  const response = await fetch(`${API_URL}/predict_stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ word }),
+  });
+  if (!response.ok) return;
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    for (const line of lines) {
+      if (!line) continue;
+      const frame = JSON.parse(line);
+      if (frame.error) throw new Error(frame.error);
+      frames.push(frame);
+    }
+  }
+}
+
 function App() {
   const [keypoints, setKeypoints] = useState(null);
   const [inputText, setInputText] = useState("");
@@ -18,27 +60,59 @@ function App() {
     setStatus("Fetching animation...");
     
     try {
-      const response = await fetch("http://localhost:5000/predict", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ word: inputText }),
-      });
-      
-      const data = await response.json();
-      
-      if (!data || data.length === 0) {
+      let data = await fetchAnimation(inputText);
+      let streaming = false;
+
+      if (data === null) {
+        // Play while the server is still extracting the animation
+        setStatus(`Generating animation for "${inputText}"...`);
+        data = [];
+        streaming = true;
+        streamAnimation(inputText, data)
+          .catch((error) => console.error(error))
+          .finally(() => { streaming = false; });
+      } else if (data.length === 0) {
         setStatus(`No animation found for "${inputText}"`);
         setLoading(false);
         return;
+      } else {
+        setStatus(`Playing "${inputText}"...`);
       }
       
-      setStatus(`Playing "${inputText}"...`);
-      
       let index = 0;
       if (animationTimer.current) clearInterval(animationTimer.current);
 
+      // Keyframed and streamed animations carry timestamps: interpolate by elapsed time
+      const timed = streaming || data[0].t !== undefined;
+      let start = performance.now();
+
       // Play at ~30 FPS
       animationTimer.current = setInterval(() => {
+          if (timed) {
+              if (data.length === 0) {
+                  if (!streaming) {
+                      clearInterval(animationTimer.current);
+                      setStatus(`No animation found for "${inputText}"`);
+                      setLoading(false);
+                  }
+                  start = performance.now();
+                  return;
+              }
+              let t = (performance.now() - start) / 1000;
+              const last = data[data.length - 1].t;
+              if (streaming && t > last) {
+                  // Caught up with the extractor: hold the pose instead of skipping ahead
+                  start = performance.now() - last * 1000;
+                  t = last;
+              }
+              setKeypoints(poseAt(data, t));
+              if (!streaming && t >= last) {
+                  clearInterval(animationTimer.current);
+                  setStatus("Finished");
+                  setLoading(false);
+              }
+              return;
+          }
           if (index >= data.length) {
               clearInterval(animationTimer.current);
               setStatus("Finished");
@@ -0,0 +1,80 @@
+// Decoder for the compact "SANM" animation format served by /predict
+// (see backend/animation_format.py for the layout).
+
+const HEADER_SIZE = 16;
+const AXES = ["x", "y", "z"];
+
+function halfToFloat(h) {
+  const sign = h & 0x8000 ? -1 : 1;
+  const exp = (h >> 10) & 0x1f;
+  const frac = h & 0x3ff;
+  if (exp === 0) return sign * Math.pow(2, -14) * (frac / 1024);
+  if (exp === 0x1f) return frac ? NaN : sign * Infinity;
+  return sign * Math.pow(2, exp - 15) * (1 + frac / 1024);
+}
+
+// Returns the same [{Bone: {x, y, z}}, ...] frame list as the JSON endpoint
+// (keyframed animations also carry their timestamp in seconds as frame.t).
+export function decodeSanm(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(
+    view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3)
+  );
+  if (magic !== "SANM") throw new Error("Not a SANM animation");
+
+  const version = view.getUint8(4);
+  const itemSize = view.getUint8(5);
+  const boneCount = view.getUint16(6, true);
+  const frameCount = view.getUint32(8, true);
+  const namesLen = view.getUint32(12, true);
+
+  const names = new TextDecoder()
+    .decode(new Uint8Array(buffer, HEADER_SIZE, namesLen))
+    .replace(/\0+$/, "");
+  const bones = boneCount ? names.split("\n") : [];
+
+  let offset = HEADER_SIZE + namesLen;
+  let times = null;
+  if (version === 2) {
+    // Keyframed animation: one float32 timestamp (seconds) per frame
+    times = new Float32Array(buffer.slice(offset, offset + frameCount * 4));
+    offset += frameCount * 4;
+  }
+  const read = itemSize === 2
+    ? () => { const v = halfToFloat(view.getUint16(offset, true)); offset += 2; return v; }
+    : () => { const v = view.getFloat32(offset, true); offset += 4; return v; };
+
+  const frames = new Array(frameCount);
+  for (let f = 0; f < frameCount; f++) {
+    const frame = {};
+    for (const bone of bones) {
+      const rot = {};
+      for (const axis of AXES) rot[axis] = read();
+      frame[bone] = rot;
+    }
+    if (times) frame.t = times[f];
+    frames[f] = frame;
+  }
+  return frames;
+}
+
+// Pose at time t (seconds) for keyframed animations: linear interpolation
+// between the surrounding keyframes.
+export function poseAt(frames, t) {
+  let i = 1;
+  while (i < frames.length - 1 && frames[i].t < t) i++;
+  const a = frames[i - 1];
+  const b = frames[i];
+  if (!b || t <= a.t) return a;
+  if (t >= b.t) return b;
+  const w = (t - a.t) / (b.t - a.t);
+  const pose = {};
+  for (const bone in a) {
+    if (bone === "t" || !b[bone]) continue;
+    pose[bone] = {};
+    for (const axis of AXES) {
+      pose[bone][axis] = a[bone][axis] + w * (b[bone][axis] - a[bone][axis]);
+    }
+  }
+  return pose;
+}
@@ -1,11 +1,25 @@
 import json
 import os
+import queue
 import subprocess
+import threading
 import wave
+from contextlib import contextmanager
 from pathlib import Path
 
 from vosk import KaldiRecognizer, Model
 
+DEFAULT_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", r"C:\vosk-model-ar")
+# Load the model at import (i.e. server startup) instead of on the first upload
+VOSK_MODEL_EAGER = os.environ.get("VOSK_MODEL_EAGER", "0") == "1"
+# Idle recognizers kept per (model, sample rate) for reuse
+VOSK_RECOGNIZER_POOL = int(os.environ.get("VOSK_RECOGNIZER_POOL", "4"))
+
+_model_cache = {}
+_model_lock = threading.Lock()
+_recognizer_pools = {}
+_pool_lock = threading.Lock()
+
 
 def _ensure_ffmpeg_path():
     ffmpeg_dir = Path("C:/ffmpeg/bin")
@@ -44,22 +58,68 @@ def wav_has_audio(file_path, min_duration_sec=0.2):
         return duration >= min_duration_sec
 
 
-def transcribe_file(file_path, model_path=r"C:\vosk-model-ar"):
-    if not Path(model_path).exists():
-        raise RuntimeError("Vosk model path not found.")
+def get_model(model_path=DEFAULT_MODEL_PATH):
+    """Process-wide Vosk model for model_path, loaded once and shared by all threads."""
+    model = _model_cache.get(model_path)
+    if model is None:
+        with _model_lock:
+            model = _model_cache.get(model_path)
+            if model is None:
+                if not Path(model_path).exists():
+                    raise RuntimeError("Vosk model path not found.")
+                model = Model(model_path)
+                _model_cache[model_path] = model
+    return model
+
+
+@contextmanager
+def _recognizer(model_path, sample_rate):
+    """
+    Borrow a KaldiRecognizer for one transcription. A recognizer is only ever
+    used by one thread at a time; up to VOSK_RECOGNIZER_POOL idle ones are
+    kept per model and sample rate, extra ones are dropped.
+    """
+    key = (model_path, sample_rate)
+    with _pool_lock:
+        pool = _recognizer_pools.setdefault(key, queue.LifoQueue(maxsize=VOSK_RECOGNIZER_POOL))
+    try:
+        rec = pool.get_nowait()
+    except queue.Empty:
+        rec = KaldiRecognizer(get_model(model_path), sample_rate)
+    try:
+        yield rec
+    except BaseException:
+        rec = None  # state unknown, don't reuse
+        raise
+    finally:
+        if rec is not None:
+            try:
+                rec.Reset()
+                pool.put_nowait(rec)
+            except (AttributeError, queue.Full):
+                pass
+
+
+def transcribe_file(file_path, model_path=DEFAULT_MODEL_PATH):
+    get_model(model_path)
 
     with wave.open(str(file_path), "rb") as wav_file:
         if wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
             raise RuntimeError("WAV must be mono 16-bit PCM.")
 
-        model = Model(model_path)
-        rec = KaldiRecognizer(model, wav_file.getframerate())
-
-        while True:
-            data = wav_file.readframes(4000)
-            if len(data) == 0:
-                break
-            rec.AcceptWaveform(data)
+        with _recognizer(model_path, wav_file.getframerate()) as rec:
+            while True:
+                data = wav_file.readframes(4000)
+                if len(data) == 0:
+                    break
+                rec.AcceptWaveform(data)
 
-        result = json.loads(rec.FinalResult())
+            result = json.loads(rec.FinalResult())
         return result.get("text", "").strip()
+
+
+if VOSK_MODEL_EAGER:
+    try:
+        get_model()
+    except Exception as e:
+        print(f"Warning: could not preload Vosk model {DEFAULT_MODEL_PATH}: {e}")